@@ -1,25 +1,42 @@
-import re
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.chat_message_histories import ChatMessageHistory
+from llm_governor import GovernedChatModel
 #from chat_handler import ChatHandler
 
 class AgentManager:
     """
     Manages different specialized agents for query processing and routing.
     """
-    def __init__(self, model="gemini-1.5-flash"):
+    def __init__(self, model="gemini-1.5-flash", llm=None, callbacks=None, governor=None):
         """
         Initialize agents with a specific language model.
         
         Args:
             model (str): Language model to use.
-        """
-        self.llm = ChatGoogleGenerativeAI(model=model)
+            llm (BaseChatModel, optional): Chat model to use instead of Gemini,
+                e.g. a fake model in benchmarks.
+            callbacks (list, optional): LangChain callback handlers attached to
+                every model call, e.g. for token accounting.
+            governor (LLMGovernor, optional): Rate limit, concurrency limit and
+                retry policy applied to every agent's model calls.
+        """
+        if llm is None:
+            # The governor owns retries; the client's own would bypass the rate limit
+            llm = ChatGoogleGenerativeAI(model=model, max_retries=0) if governor else ChatGoogleGenerativeAI(model=model)
+        self.chat_model = llm
+        self.governor = governor
+        governed = GovernedChatModel(model=self.chat_model, governor=governor) if governor else self.chat_model
+        self.llm = governed.with_config(callbacks=callbacks) if callbacks else governed
         
     
+    @staticmethod
+    def _escape(text):
+        """
+        Escape braces in config text so it is not read as template variables.
+        """
+        return text.replace("{", "{{").replace("}", "}}")
+
     def create_answerability_agent(self):
         """
         Create an agent to determine if a question can be answered 
@@ -39,33 +56,23 @@ class AgentManager:
              "Answer with 'yes' or 'no'.\n\nCV: {cv}\n\nChat History: {chat_history}\n\nQuestion: {input}")
         ])
         
-        return (
-            RunnablePassthrough.assign()
-            | prompt
-            | self.llm
-            | StrOutputParser()
-        )
+        return prompt | self.llm | StrOutputParser()
     
-    def create_data_identifier_agent(self):
+    def create_data_identifier_agent(self, registry):
         """
         Create an agent to identify which data source is relevant.
         
         Args:
-            cv_text (str): CV text for context.
+            registry (SourceRegistry): Sources offered as numbered options.
         
         Returns:
             Runnable: Data identifier agent chain.
         """
         system_prompt = (
             "You are an assistant that determines which additional data source is relevant:\n"
-            "1. Sarwesh's Transcript: Contains all the College coursework and academic details\n"
-            "2. Publication Report: Contains the published research paper\n"
-            "3. Snowflake Report: Contains the report of the Snowflake project\n"
-            "4. Mitacs Report: Contains the report of the Mitacs project\n"
-            "5. None of the above four data are relevant to the question\n"
-            "6. The Question is not relevant to Sarwesh\n\n"
+            + self._escape(registry.numbered_options()) + "\n\n"
             "Respond with the number corresponding to the required data source.\n"
-            "Here is Sarwesh's Resume for your reference: {cv}\n"
+            f"Here is {self._escape(registry.profile_name)}'s Resume for your reference: {{cv}}\n"
         )
         
         prompt = ChatPromptTemplate.from_messages([
@@ -73,112 +80,75 @@ class AgentManager:
             ("human", "Given the following question, identify which additional data source is needed: {input}")
         ])
         
-        return (
-            RunnablePassthrough.assign()
-            | prompt
-            | self.llm
-            | StrOutputParser()
-        )
-    
-    def create_transcript_agent(self):
-        """
-        Create an agent to analyze Sarwesh's academic transcript.
-        
-        Returns:
-            Runnable: Transcript analysis agent chain.
-        """
-        system_prompt = (
-            "You are an assistant that analyses Sarwesh's Academic Transcript and answers the  questions related to it. \n\n"
-            "Here is Sarwesh's Academic Transcript : \n {transcript}"
-        )
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("human", "Analyze the transcript and answer the following question.\n\nQuestion: {input}\n\n")
-        ])
-        
-        return (
-            RunnablePassthrough.assign()
-            | prompt
-            | self.llm
-            | StrOutputParser()
-        )
-    
-    def create_publication_agent(self):
+        return prompt | self.llm | StrOutputParser()
+
+    def create_router_agent(self, registry):
         """
-        Create an agent to handle queries about publications.
-        
+        Create an agent that decides answerability and the data source
+        in a single call.
+
+        Args:
+            registry (SourceRegistry): Sources offered as numbered options.
+
         Returns:
-            Runnable: Publication agent chain.
+            Runnable: Combined routing agent chain.
         """
         system_prompt = (
-            "You are a helpful assistant that helps in answering any questions regarding to the publication of Sarwesh."
-            "Use Sarwesh's resume and the following publication report for answering any question."
-            "Here is the resume {cv}\n\nPublication Report Context:\n{publication_context}\n\n"
+            f"You are an assistant that decides how a question about {self._escape(registry.profile_name)} should be answered:\n"
+            + self._escape(registry.numbered_options(include_cv=True)) + "\n\n"
+            "Respond with the single number corresponding to the required data source."
         )
-        
+
         prompt = ChatPromptTemplate.from_messages([
             ("system", system_prompt),
-            ("human", "Question: {input}")
+            ("human", "CV: {cv}\n\nChat History: {chat_history}\n\nQuestion: {input}")
         ])
-        
-        return (
-            RunnablePassthrough.assign()
-            | prompt
-            | self.llm
-            | StrOutputParser()
-        )
-    
-    def create_mitacs_agent(self):
+
+        return prompt | self.llm | StrOutputParser()
+
+    def create_source_agent(self, source):
         """
-        Create an agent to handle queries about the Mitacs project.
-        
+        Create an agent that answers questions from one registered data source.
+
+        Args:
+            source (Source): Source whose prompt and context the agent uses.
+
         Returns:
-            Runnable: Mitacs project agent chain.
+            Runnable: Source agent chain taking "input", "context" and, if the
+                source includes it, "cv".
         """
-        system_prompt = (
-            "You are a helpful assistant that helps in answering any questions regarding to the Mitacs Intern/ project of Sarwesh."
-            "Use Sarwesh's resume and the following mitacs research report for answering any question."
-            "Here is the resume {cv}\n\n mitacs research Report :\n{mitacs_text}\n\n"
-        )
-        
+        system_prompt = self._escape(source.prompt) + "\n\n"
+        if source.include_cv:
+            system_prompt += "Here is the resume {cv}\n\n"
+        system_prompt += self._escape(source.title) + " Context:\n{context}\n\n"
+
         prompt = ChatPromptTemplate.from_messages([
             ("system", system_prompt),
             ("human", "Question: {input}")
         ])
-        
-        return (
-            RunnablePassthrough.assign()
-            | prompt
-            | self.llm
-            | StrOutputParser()
-        )
-    
-    def create_snowflake_agent(self):
+
+        return prompt | self.llm | StrOutputParser()
+
+    def create_summary_agent(self):
         """
-        Create an agent to handle queries about the Snowflake project.
-        
+        Create an agent that folds older chat turns into a running summary.
+
         Returns:
-            Runnable: Snowflake project agent chain.
+            Runnable: Conversation summarizer chain.
         """
         system_prompt = (
-            "You are a helpful assistant that helps in answering any questions regarding to the Snowflake intern of Sarwesh."
-            "Use Sarwesh's resume and the following snowflake work report for answering any question."
-            "Here is the resume {cv}\n\n Snowflake intern Report Context:\n{snowflake_context}\n\n"
+            "You progressively summarize a conversation between a user and an assistant about Sarwesh's profile. "
+            "Extend the current summary with the new lines of conversation, keeping facts the user may refer back to. "
+            "Keep the summary under {max_tokens} tokens."
         )
-        
+
         prompt = ChatPromptTemplate.from_messages([
             ("system", system_prompt),
-            ("human", "Question: {input}")
+            ("human", "Current summary:\n{summary}\n\nNew lines of conversation:\n{new_lines}\n\nNew summary:")
         ])
-        
-        return (
-            RunnablePassthrough.assign()
-            | prompt
-            | self.llm
-            | StrOutputParser()
-        )
-    
+
+        return prompt | self.llm | StrOutputParser()
+
     def create_main_agent(self):
         """
         Create the main conversational agent.
@@ -198,15 +168,6 @@ class AgentManager:
             ("human", "{input}")
         ])
 
-        # Base chain without history tracking
-        base_chain = (
-            RunnablePassthrough.assign(
-            )
-            | prompt
-            | self.llm
-            | StrOutputParser()
-        )
-        
-
-        
-        return base_chain
\ No newline at end of file
+        # The prompt takes the input dict directly: an empty RunnablePassthrough.assign()
+        # in front of it streams None into it on langchain-core 0.2 and 0.3
+        return prompt | self.llm | StrOutputParser()
@@ -0,0 +1,179 @@
+"""
+Headless batch mode: answer a JSONL file of questions with ProfileQuerySystem.
+
+Each input line is a JSON object with a "question" (or "input") and
+optionally an "id" and a "session_id"; questions without a session get a
+fresh one, so answers do not depend on each other. Results are appended to
+the output JSONL file as soon as each question finishes, followed by a
+summary of throughput and latency percentiles on stdout.
+
+Usage:
+    python batch_cli.py questions.jsonl answers.jsonl [--workers 8] [--fake-llm]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from main import ProfileQuerySystem
+from tracing import percentile
+
+
+def read_questions(path):
+    """
+    Read questions from a JSONL file.
+
+    Args:
+        path (str): Input file; "-" reads stdin.
+
+    Returns:
+        list[dict]: Questions with "id", "question" and "session_id" keys.
+    """
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    questions = []
+    try:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            question = record.get("question", record.get("input"))
+            if not question:
+                raise ValueError(f"{path}:{number}: missing 'question'")
+            questions.append({
+                "id": record.get("id", number),
+                "question": question,
+                "session_id": record.get("session_id"),
+            })
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    return questions
+
+
+def answer(system, item):
+    """
+    Run one question through route_query_stream and time it.
+
+    Returns:
+        dict: The output record.
+    """
+    info = {}
+    chunks = []
+    first_token = None
+    error = None
+    started = time.perf_counter()
+    try:
+        for chunk in system.route_query_stream(
+            {"input": item["question"]}, item["session_id"] or f"batch-{item['id']}", info
+        ):
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            chunks.append(chunk)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    latency = time.perf_counter() - started
+    return {
+        "id": item["id"],
+        "question": item["question"],
+        "answer": "".join(chunks),
+        "route": info.get("route"),
+        "cache_hit": info.get("cache_hit", False),
+        "latency_ms": round(latency * 1000, 2),
+        "first_token_ms": round(first_token * 1000, 2) if first_token is not None else None,
+        "error": error,
+    }
+
+
+def run_batch(system, questions, output_path, workers=4):
+    """
+    Answer questions concurrently and stream the results to a JSONL file.
+
+    Args:
+        system (ProfileQuerySystem): System to query.
+        questions (list[dict]): Questions from read_questions().
+        output_path (str): Output file; "-" writes to stdout.
+        workers (int, optional): Questions processed in parallel.
+
+    Returns:
+        dict: Count, errors, wall time, throughput, routes and latency percentiles.
+    """
+    out = sys.stdout if output_path == "-" else open(output_path, "w", encoding="utf-8")
+    write_lock = threading.Lock()
+    latencies, routes, errors = [], {}, 0
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(answer, system, item) for item in questions]
+            for future in as_completed(futures):
+                record = future.result()
+                with write_lock:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                    out.flush()
+                if record["error"]:
+                    errors += 1
+                else:
+                    latencies.append(record["latency_ms"])
+                routes[str(record["route"])] = routes.get(str(record["route"]), 0) + 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    seconds = time.perf_counter() - started
+
+    summary = {
+        "questions": len(questions),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "questions_per_second": round(len(questions) / seconds, 3) if seconds else None,
+        "routes": routes,
+    }
+    if latencies:
+        ordered = sorted(latencies)
+        summary.update({
+            "p50_ms": percentile(ordered, 0.50),
+            "p95_ms": percentile(ordered, 0.95),
+            "p99_ms": percentile(ordered, 0.99),
+            "max_ms": ordered[-1],
+        })
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions without the chat UI.")
+    parser.add_argument("input", help="JSONL file of questions, or - for stdin")
+    parser.add_argument("output", help="JSONL file the answers are written to, or - for stdout")
+    parser.add_argument("--workers", type=int, default=4, help="Questions processed in parallel")
+    parser.add_argument("--routing-mode", help="Overrides ROUTING_MODE")
+    parser.add_argument("--sources-config", help="Overrides SOURCES_CONFIG")
+    parser.add_argument("--fake-llm", action="store_true",
+                        help="Use the offline fake chat model and hashing embeddings from benchmarks/")
+    parser.add_argument("--fake-latency", type=float, default=0.0, help="Simulated seconds per fake model call")
+    args = parser.parse_args()
+
+    load_dotenv()
+    # Batch runs are one-shot; there is nothing to hot-reload
+    os.environ.setdefault("WATCH_DOCUMENTS", "false")
+    llm = embeddings = None
+    if args.fake_llm:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks"))
+        from fakes import FakeChatModel, FakeEmbeddings
+        llm = FakeChatModel(latency=args.fake_latency)
+        embeddings = FakeEmbeddings()
+
+    questions = read_questions(args.input)
+    system = ProfileQuerySystem(
+        routing_mode=args.routing_mode, sources_config=args.sources_config, llm=llm, embeddings=embeddings
+    )
+    try:
+        summary = run_batch(system, questions, args.output, workers=args.workers)
+    finally:
+        system.executor.shutdown(wait=False)
+    print(json.dumps(summary, indent=2), file=sys.stderr if args.output == "-" else sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
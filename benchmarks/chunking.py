@@ -0,0 +1,126 @@
+"""
+Compare the token-based chunker with the old 4000/1000 character splitter.
+
+For each chunker the benchmark reports the number of chunks, the tokens
+sent to the embedding model (the ingestion cost), how many of those are
+duplicated by overlap, the prompt tokens of a top-k retrieval, and the
+retrieval hit rate. Retrieval uses the offline HashingEmbeddings so the
+benchmark needs no network access.
+
+Queries come from a JSONL file of {"query": ..., "expected": ...} lines,
+where a query is a hit when a retrieved chunk contains the expected text.
+Without one, probe queries are sampled from the documents themselves: a
+line of the document is the query and a run of words from it is the
+expected text.
+
+Usage:
+    python benchmarks/chunking.py [--config sources.json] [--queries queries.jsonl]
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from chunker import PAGE_BREAK, TokenChunker
+from data_loader import DocumentLoader
+from embeddings import HashingEmbeddings
+from source_registry import SourceRegistry
+from tokens import count_tokens
+from vector_store import VectorStoreManager
+
+
+def probe_queries(documents, per_document=20, seed=0):
+    """
+    Sample (query, expected) pairs from the documents' own lines.
+    """
+    rng = random.Random(seed)
+    queries = []
+    for text in documents.values():
+        lines = [
+            " ".join(line.split())
+            for line in (text or "").replace(PAGE_BREAK, "\n").split("\n")
+            if len(line.split()) >= 8
+        ]
+        for line in rng.sample(lines, min(per_document, len(lines))):
+            words = line.split()
+            start = rng.randrange(0, len(words) - 5)
+            queries.append((line, " ".join(words[start:start + 5])))
+    return queries
+
+
+def evaluate(name, chunks, vector_store_manager, queries, top_k, document_tokens):
+    vector_store = vector_store_manager.create_vector_store_from_chunks(chunks)
+    retrieval = vector_store_manager.evaluate_retrieval(
+        vector_store, queries, top_k=top_k, modes=("vector",)
+    )["vector"]
+    context_tokens = [
+        sum(count_tokens(doc.page_content) for doc in vector_store_manager.search_documents(
+            query, vector_store, top_k=top_k, mode="vector"
+        ))
+        for query, _ in queries
+    ]
+    embedded_tokens = sum(count_tokens(chunk) for chunk in chunks)
+    return {
+        "chunker": name,
+        "chunks": len(chunks),
+        "embedded_tokens": embedded_tokens,
+        "duplicated_tokens": max(0, embedded_tokens - document_tokens),
+        "mean_context_tokens": sum(context_tokens) / len(context_tokens) if context_tokens else 0.0,
+        **retrieval,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default="sources.json", help="Source registry with the documents to chunk")
+    parser.add_argument("--queries", help="JSONL file of labelled queries")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--chunk-tokens", type=int, default=300)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    registry = SourceRegistry.load(args.config)
+    documents = DocumentLoader().load_documents(registry.document_paths())
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [(item["query"], item["expected"]) for item in map(json.loads, f) if item]
+    else:
+        queries = probe_queries(documents)
+
+    character_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=4000, chunk_overlap=1000, separators=["\n\n", "\n", " ", ""]
+    )
+    token_chunker = TokenChunker(chunk_tokens=args.chunk_tokens)
+    texts = [text or "" for text in documents.values()]
+    # Tokens of the documents themselves, without page breaks or repeated whitespace
+    document_tokens = sum(count_tokens(re.sub(r"\s+", " ", text)) for text in texts)
+
+    vector_store_manager = VectorStoreManager(embeddings=HashingEmbeddings(), max_workers=1)
+    results = [
+        evaluate(
+            "character_4000_1000",
+            [chunk for text in texts for chunk in character_splitter.split_text(text)],
+            vector_store_manager, queries, args.top_k, document_tokens
+        ),
+        evaluate(
+            f"token_{args.chunk_tokens}",
+            [chunk for text in texts for chunk in token_chunker.split_text(text)],
+            vector_store_manager, queries, args.top_k, document_tokens
+        ),
+    ]
+
+    report = {"documents": len(texts), "document_tokens": document_tokens, "queries": len(queries), "results": results}
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
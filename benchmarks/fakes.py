@@ -0,0 +1,125 @@
+"""
+Deterministic stand-ins for the Gemini chat and embedding models.
+
+Both fakes simulate network latency with sleeps, so benchmarks measure the
+application's own overhead plus a configurable, reproducible model cost.
+"""
+import asyncio
+import hashlib
+import random
+import re
+import threading
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from embeddings import HashingEmbeddings
+
+
+def _stable_hash(text):
+    return int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:8], "little")
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model that answers the project's prompts without a network call.
+
+    Answerability prompts get "yes" or "no", routing prompts get one of the
+    numbered options they list, and everything else gets filler text of
+    response_tokens words. Choices are derived from a hash of the prompt, so
+    the same question is always routed the same way. A fraction error_rate
+    of calls fails with a simulated rate-limit error.
+    """
+    latency: float = 0.0
+    token_latency: float = 0.0
+    response_tokens: int = 40
+    error_rate: float = 0.0
+    seed: int = 0
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _respond(self, messages):
+        self.calls += 1
+        if self.error_rate and random.Random(self.seed * 1_000_003 + self.calls).random() < self.error_rate:
+            raise RuntimeError("429 Resource exhausted (simulated model error)")
+
+        prompt = "\n".join(str(message.content) for message in messages)
+        question = str(messages[-1].content)
+        choice = _stable_hash(question)
+        if "'yes' or 'no'" in prompt:
+            return "yes" if choice % 2 else "no"
+        options = re.findall(r"^(\d+)\. ", prompt, re.MULTILINE)
+        if options and "Respond with the" in prompt:
+            return options[choice % len(options)]
+        words = ["Simulated", "answer"] + [f"token{i}" for i in range(max(0, self.response_tokens - 2))]
+        return " ".join(words)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._respond(messages)
+        time.sleep(self.latency + self.token_latency * len(text.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._respond(messages)
+        await asyncio.sleep(self.latency + self.token_latency * len(text.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        words = self._respond(messages).split(" ")
+        time.sleep(self.latency)
+        for i, word in enumerate(words):
+            time.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        words = self._respond(messages).split(" ")
+        await asyncio.sleep(self.latency)
+        for i, word in enumerate(words):
+            await asyncio.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class FakeEmbeddings(HashingEmbeddings):
+    """
+    HashingEmbeddings with simulated request latency and call counting.
+    """
+    def __init__(self, dimensions=384, latency=0.0, text_latency=0.0):
+        """
+        Initialize the fake embedder.
+
+        Args:
+            dimensions (int, optional): Size of the output vectors.
+            latency (float, optional): Seconds added to every request.
+            text_latency (float, optional): Seconds added per embedded text.
+        """
+        super().__init__(dimensions=dimensions, model="fake-hashing")
+        self.latency = latency
+        self.text_latency = text_latency
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def _record(self, count):
+        with self._lock:
+            self.calls += 1
+            self.texts += count
+        time.sleep(self.latency + self.text_latency * count)
+
+    def embed_documents(self, texts):
+        self._record(len(texts))
+        return super().embed_documents(texts)
+
+    def embed_query(self, text):
+        self._record(1)
+        return super().embed_query(text)
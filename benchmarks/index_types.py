@@ -0,0 +1,141 @@
+"""
+Compare the flat, float16 and IVF-PQ vector index types.
+
+For each corpus size and index type the benchmark reports the build time,
+the serialized index size, the resident memory added by loading the index
+from the cache (copied or memory-mapped), vector search latency and the
+recall of the top-k results against the exact flat index. Embeddings come
+from the offline FakeEmbeddings, so no network access is needed.
+
+Usage:
+    python benchmarks/index_types.py [--sizes 1000,10000] [--top-k 5] [--output results.json]
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import faiss
+
+from fakes import FakeEmbeddings
+from synthetic import make_chunks, make_queries
+from tracing import percentile
+from vector_store import INDEX_TYPES, VectorStoreManager
+
+
+def latency_summary(values):
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": percentile(ordered, 0.50),
+        "p95": percentile(ordered, 0.95),
+    }
+
+
+def resident_bytes():
+    """
+    Resident set size of this process, or None where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def load_cost(chunks, index_type, cache_dir, mmap):
+    """
+    Resident memory added by loading an already cached index.
+
+    Raises:
+        RuntimeError: If the index was rebuilt instead of loaded, e.g.
+            because faiss cannot read it with the mmap flags.
+    """
+    manager = VectorStoreManager(embeddings=FakeEmbeddings(), cache_dir=cache_dir, index_type=index_type, mmap=mmap)
+    gc.collect()
+    before = resident_bytes()
+    started = time.perf_counter()
+    vector_store = manager.create_vector_store_from_chunks(chunks)
+    seconds = time.perf_counter() - started
+    after = resident_bytes()
+    if manager.index_cache.misses:
+        raise RuntimeError(f"Cached {index_type} index could not be loaded (mmap={mmap})")
+    loaded = {
+        "faiss_index": type(vector_store.index).__name__,
+        "load_seconds": seconds,
+        "resident_delta_bytes": after - before if before is not None else None,
+    }
+    del vector_store, manager
+    return loaded
+
+
+def bench_index_type(chunks, queries, index_type, exact, work_dir, args):
+    cache_dir = os.path.join(work_dir, f"{index_type}-{len(chunks)}")
+    manager = VectorStoreManager(embeddings=FakeEmbeddings(), cache_dir=cache_dir, index_type=index_type)
+    started = time.perf_counter()
+    vector_store = manager.create_vector_store_from_chunks(chunks)
+    build_seconds = time.perf_counter() - started
+
+    latencies, recalls, results = [], [], []
+    for query in queries:
+        started = time.perf_counter()
+        docs = manager.search_documents(query, vector_store, top_k=args.top_k, mode="vector")
+        latencies.append((time.perf_counter() - started) * 1000)
+        found = [doc.page_content for doc in docs]
+        results.append(found)
+        if exact is not None:
+            expected = exact[len(results) - 1]
+            recalls.append(len(set(found) & set(expected)) / len(expected) if expected else 1.0)
+
+    return {
+        "index_type": index_type,
+        "faiss_index": type(vector_store.index).__name__,
+        "build_seconds": build_seconds,
+        "index_bytes": len(faiss.serialize_index(vector_store.index)),
+        "latency_ms": latency_summary(latencies),
+        f"recall_at_{args.top_k}": sum(recalls) / len(recalls) if recalls else 1.0,
+        "load": {
+            "copied": load_cost(chunks, index_type, cache_dir, mmap=False),
+            "mmap": load_cost(chunks, index_type, cache_dir, mmap=True),
+        },
+    }, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=lambda v: [int(x) for x in v.split(",")], default=[1000, 10000],
+                        help="Comma-separated chunk counts of the corpora")
+    parser.add_argument("--queries", type=int, default=200, help="Searches per index")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    report = {"faiss": getattr(faiss, "__version__", None), "results": []}
+    with tempfile.TemporaryDirectory() as work_dir:
+        for size in args.sizes:
+            chunks = make_chunks(size, seed=size)
+            queries = [query for query, _ in make_queries({"chunks": "\n".join(chunks)}, args.queries, seed=size)]
+            exact = None
+            for index_type in INDEX_TYPES:
+                result, found = bench_index_type(chunks, queries, index_type, exact, work_dir, args)
+                if index_type == "flat":
+                    exact = found
+                report["results"].append({"chunks": size, **result})
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""
+Offline benchmark suite for startup, query routing, retrieval, sessions and
+the LLM call governor.
+
+ProfileQuerySystem is built on a synthetic corpus with a fake chat model
+and fake embeddings (see fakes.py), so no Gemini access is needed and the
+simulated model latency is under the caller's control. Results are
+written as JSON for comparison between runs.
+
+Usage:
+    python benchmarks/run.py [--llm-latency 0.2] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import HumanMessage
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from chat_handler import InMemorySessionBackend, SQLiteSessionBackend
+from fakes import FakeChatModel, FakeEmbeddings
+from llm_governor import GovernedChatModel, LLMGovernor
+from main import ProfileQuerySystem
+from source_registry import CV_ROUTE
+from synthetic import make_chunks, make_corpus, make_queries
+from tracing import percentile
+from vector_store import VectorStoreManager
+
+
+def summarize(values):
+    """
+    Mean and percentiles of a list of measurements.
+
+    Returns:
+        dict: count, mean, p50, p95, p99 and max.
+    """
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+    count = len(ordered)
+
+    return {
+        "count": count,
+        "mean": sum(ordered) / count,
+        "p50": percentile(ordered, 0.50),
+        "p95": percentile(ordered, 0.95),
+        "p99": percentile(ordered, 0.99),
+        "max": ordered[-1],
+    }
+
+
+class StageTimer:
+    """
+    Records the time spent in selected methods of live objects.
+    """
+    def __init__(self):
+        self.current = {}
+
+    def wrap(self, owner, attribute, stage, condition=None):
+        """
+        Replace owner.attribute with a wrapper that adds its duration to a stage.
+
+        Args:
+            owner (object): Instance whose method is timed.
+            attribute (str): Method name.
+            stage (str): Stage the time is attributed to.
+            condition (callable, optional): Only time calls whose arguments pass it.
+        """
+        method = getattr(owner, attribute)
+
+        def timed(*args, **kwargs):
+            if condition is not None and not condition(*args, **kwargs):
+                return method(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.current[stage] = self.current.get(stage, 0.0) + time.perf_counter() - started
+
+        setattr(owner, attribute, timed)
+
+
+def build_system(config_path, cache_dir, args):
+    os.environ.update({
+        "TEXT_CACHE_DIR": os.path.join(cache_dir, "text"),
+        "INDEX_CACHE_DIR": os.path.join(cache_dir, "index"),
+        "WATCH_DOCUMENTS": "false",
+        "RESPONSE_CACHE": "false",
+        # The default 5 requests/s would make the stage timings mostly throttling
+        "LLM_RATE_LIMIT": str(args.route_rate_limit),
+    })
+    llm = FakeChatModel(latency=args.llm_latency, token_latency=args.token_latency, error_rate=args.error_rate)
+    embeddings = FakeEmbeddings(latency=args.embedding_latency)
+    started = time.perf_counter()
+    system = ProfileQuerySystem(
+        routing_mode=args.routing_mode, sources_config=config_path, llm=llm, embeddings=embeddings
+    )
+    ready = time.perf_counter() - started
+    started = time.perf_counter()
+    system.warm_up().join()
+    warm_up = time.perf_counter() - started
+    return system, {
+        "ready_seconds": ready,
+        "warm_up_seconds": warm_up,
+        "embedding_calls": embeddings.calls,
+        "embedded_texts": embeddings.texts,
+    }
+
+
+def bench_startup(config_path, work_dir, args):
+    cache_dir = os.path.join(work_dir, "cache")
+    _, cold = build_system(config_path, cache_dir, args)
+    system, warm = build_system(config_path, cache_dir, args)
+    return system, {"cold": cold, "warm": warm}
+
+
+def bench_route_query(system, documents, args):
+    timer = StageTimer()
+    timer.wrap(system.history_manager, "window", "history_window")
+    timer.wrap(system.context_packer, "pack", "pack_cv", condition=lambda query, name, *a, **k: name == CV_ROUTE)
+    timer.wrap(system, "_route", "routing")
+    timer.wrap(system, "_retrieve_context", "retrieval")
+
+    queries = [query for query, _ in make_queries(documents, args.queries, seed=1)]
+    governor = system.agent_manager.governor
+    throttled_before = governor.stats()["throttled_seconds"] if governor else 0.0
+    stages, totals, first_tokens = {}, [], []
+    for i, query in enumerate(queries):
+        session_id = f"bench-{i // 2}"
+        timer.current = {}
+        started = time.perf_counter()
+        first_token = None
+        for _ in system.route_query_stream({"input": query}, session_id):
+            if first_token is None:
+                first_token = time.perf_counter() - started
+        total = time.perf_counter() - started
+        totals.append(total * 1000)
+        first_tokens.append((first_token or total) * 1000)
+        measured = dict(timer.current)
+        measured["generation"] = max(0.0, total - sum(measured.values()))
+        for stage, seconds in measured.items():
+            stages.setdefault(stage, []).append(seconds * 1000)
+
+    return {
+        "routing_mode": system.routing_mode,
+        "total_ms": summarize(totals),
+        "first_token_ms": summarize(first_tokens),
+        "stages_ms": {stage: summarize(values) for stage, values in sorted(stages.items())},
+        "llm_calls": system.agent_manager.chat_model.calls,
+        # Time spent waiting for the governor's rate limit; included in total_ms and generation
+        "throttled_seconds": governor.stats()["throttled_seconds"] - throttled_before if governor else 0.0,
+        "llm_governor": governor.stats() if governor else None,
+    }
+
+
+def bench_governor(args):
+    """
+    Fire a burst of concurrent model calls, a share of them duplicates,
+    through a governed fake model.
+    """
+    llm = FakeChatModel(latency=args.llm_latency, error_rate=args.error_rate, seed=7)
+    governor = LLMGovernor(
+        rate=args.llm_rate_limit, burst=args.llm_burst, max_concurrency=args.llm_concurrency,
+        max_retries=4, base_delay=0.05, max_delay=1.0
+    )
+    model = GovernedChatModel(model=llm, governor=governor)
+    distinct = max(1, int(args.burst_calls * (1 - args.duplicate_ratio)))
+    prompts = [f"Question {i % distinct} about the profile?" for i in range(args.burst_calls)]
+
+    def call(prompt):
+        started = time.perf_counter()
+        try:
+            model.invoke([HumanMessage(content=prompt)])
+            return (time.perf_counter() - started) * 1000, None
+        except Exception as e:
+            return (time.perf_counter() - started) * 1000, type(e).__name__
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.burst_calls) as pool:
+        results = list(pool.map(call, prompts))
+    seconds = time.perf_counter() - started
+    return {
+        "requests": len(prompts),
+        "distinct_prompts": distinct,
+        "seconds": seconds,
+        "latency_ms": summarize([latency for latency, _ in results]),
+        "failures": sum(1 for _, error in results if error),
+        "model_calls": llm.calls,
+        "governor": governor.stats(),
+    }
+
+
+def bench_retrieval(args):
+    results = []
+    for size in args.sizes:
+        chunks = make_chunks(size, seed=size)
+        embeddings = FakeEmbeddings(latency=args.embedding_latency)
+        manager = VectorStoreManager(embeddings=embeddings)
+        started = time.perf_counter()
+        vector_store = manager.create_vector_store_from_chunks(chunks)
+        build_seconds = time.perf_counter() - started
+
+        queries = [query for query, _ in make_queries({"chunks": "\n".join(chunks)}, args.search_queries, seed=size)]
+        result = {
+            "chunks": size,
+            "build_seconds": build_seconds,
+            "build_chunks_per_second": size / build_seconds if build_seconds else None,
+            "modes": {},
+        }
+        for mode in ("vector", "hybrid", "lexical_first"):
+            latencies = []
+            for query in queries:
+                started = time.perf_counter()
+                manager.search_documents(query, vector_store, top_k=5, mode=mode)
+                latencies.append((time.perf_counter() - started) * 1000)
+            result["modes"][mode] = {
+                "latency_ms": summarize(latencies),
+                "queries_per_second": len(queries) / (sum(latencies) / 1000) if latencies else None,
+            }
+        # Fresh queries so the batch is not served from the query-embedding cache
+        batch = [query + " batch" for query in queries]
+        started = time.perf_counter()
+        manager.batch_search(batch, vector_store, top_k=5)
+        batch_seconds = time.perf_counter() - started
+        result["modes"]["batch"] = {"queries_per_second": len(batch) / batch_seconds if batch_seconds else None}
+        results.append(result)
+    return results
+
+
+def _fill_sessions(backend, count):
+    for i in range(count):
+        history = backend.get(f"session-{i}")
+        history.add_user_message(f"Question {i} about the profile?")
+        history.add_ai_message(f"Answer {i} with a few words of detail.")
+
+
+def bench_sessions(work_dir, args):
+    results = []
+    for count in args.sessions:
+        for name, make_backend in (
+            ("memory_bounded", lambda: InMemorySessionBackend(max_sessions=1000)),
+            ("memory_unbounded", lambda: InMemorySessionBackend(max_sessions=count)),
+            ("sqlite", lambda: SQLiteSessionBackend(os.path.join(work_dir, f"sessions-{count}.db"), max_sessions=1000)),
+        ):
+            tracemalloc.start()
+            started = time.perf_counter()
+            backend = make_backend()
+            _fill_sessions(backend, count)
+            seconds = time.perf_counter() - started
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.append({
+                "backend": name,
+                "sessions_created": count,
+                "sessions_kept": len(backend),
+                "python_memory_bytes": current,
+                "peak_python_memory_bytes": peak,
+                "sessions_per_second": count / seconds if seconds else None,
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated seconds before the first token")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Simulated seconds per generated token")
+    parser.add_argument("--embedding-latency", type=float, default=0.01, help="Simulated seconds per embedding request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of simulated model calls that fail")
+    parser.add_argument("--routing-mode", default="sequential")
+    parser.add_argument("--pages", type=int, default=10, help="Pages per synthetic source document")
+    parser.add_argument("--queries", type=int, default=50, help="route_query calls to time")
+    parser.add_argument("--search-queries", type=int, default=100, help="Searches per corpus size")
+    parser.add_argument("--sizes", type=lambda v: [int(x) for x in v.split(",")], default=[100, 1000, 5000],
+                        help="Comma-separated chunk counts of the retrieval corpora")
+    parser.add_argument("--sessions", type=lambda v: [int(x) for x in v.split(",")], default=[1000, 5000],
+                        help="Comma-separated numbers of sessions to create")
+    parser.add_argument("--burst-calls", type=int, default=64, help="Concurrent calls of the governor benchmark")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.5, help="Share of burst calls repeating a prompt")
+    parser.add_argument("--route-rate-limit", type=float, default=0.0,
+                        help="Governor requests per second of the route_query benchmark; 0 disables it")
+    parser.add_argument("--llm-rate-limit", type=float, default=20.0, help="Governor requests per second")
+    parser.add_argument("--llm-burst", type=int, default=10, help="Governor token bucket size")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="Governor concurrency limit")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        config_path, documents = make_corpus(os.path.join(work_dir, "corpus"), pages=args.pages)
+        system, startup = bench_startup(config_path, work_dir, args)
+        report = {
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "arguments": vars(args),
+            },
+            "startup": startup,
+            "route_query": bench_route_query(system, documents, args),
+            "retrieval": bench_retrieval(args),
+            "sessions": bench_sessions(work_dir, args),
+            "llm_governor": bench_governor(args),
+        }
+        system.executor.shutdown(wait=False)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
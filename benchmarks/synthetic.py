@@ -0,0 +1,130 @@
+"""
+Synthetic profile corpora of configurable size for offline benchmarks.
+"""
+import json
+import os
+import random
+
+from chunker import PAGE_BREAK
+
+_WORDS = (
+    "analysis data model research project system learning network course grade semester "
+    "method result experiment evaluation dataset training query intent document search "
+    "ranking feature pipeline performance accuracy baseline report internship university "
+    "optimisation signal market sentiment causality regression language embedding cluster"
+).split()
+
+
+def _sentence(rng, words=12):
+    tokens = [rng.choice(_WORDS) for _ in range(words)]
+    # Rare identifiers give lexical retrieval something exact to match
+    tokens.insert(rng.randrange(len(tokens)), f"{rng.choice('ABCDEFGH')}{rng.choice('XYZ')}{rng.randrange(10000):04d}")
+    sentence = " ".join(tokens)
+    return sentence[0].upper() + sentence[1:] + "."
+
+
+def make_document(rng, title, pages, paragraphs_per_page=4, sentences_per_paragraph=4):
+    """
+    Generate a document with a running header, section headings and page breaks.
+
+    Returns:
+        str: Document text with pages separated by PAGE_BREAK.
+    """
+    page_texts = []
+    for page in range(1, pages + 1):
+        lines = [f"{title} - confidential"]
+        for paragraph in range(paragraphs_per_page):
+            if paragraph % 2 == 0:
+                lines.append(f"SECTION {page}.{paragraph // 2 + 1}")
+            lines.append(" ".join(_sentence(rng) for _ in range(sentences_per_paragraph)))
+            lines.append("")
+        lines.append(f"Page {page} of {pages}")
+        page_texts.append("\n".join(lines))
+    return PAGE_BREAK.join(page_texts)
+
+
+def make_corpus(directory, sources=4, pages=10, cv_pages=2, seed=0):
+    """
+    Write a synthetic CV, source documents and a registry config.
+
+    Args:
+        directory (str): Directory to write into.
+        sources (int, optional): Number of additional data sources.
+        pages (int, optional): Pages per source document.
+        cv_pages (int, optional): Pages of the CV.
+        seed (int, optional): Random seed.
+
+    Returns:
+        tuple: (path of the sources config, dict of document texts by name)
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    documents = {"cv": make_document(rng, "Curriculum Vitae", cv_pages)}
+    config_sources = []
+    for i in range(1, sources + 1):
+        name = f"source{i}"
+        documents[name] = make_document(rng, f"Report {i}", pages)
+        config_sources.append({
+            "name": name,
+            "title": f"Report {i}",
+            "description": f"Synthetic report number {i}",
+            "files": [f"{name}.txt"],
+            "prompt": f"You answer questions using report {i}.",
+            "chunking": "sections" if i % 2 else "splitter",
+            "examples": [_sentence(rng, 8) for _ in range(4)],
+        })
+
+    for name, text in documents.items():
+        with open(os.path.join(directory, f"{name}.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    config = {
+        "profile_name": "Alex",
+        "data_dir": directory,
+        "cv_files": ["cv.txt"],
+        "sources": config_sources,
+        "none_examples": ["What is Alex's favourite food?", "Does Alex have any siblings?"],
+        "off_topic_examples": ["What is the capital of France?", "Write me a poem about the ocean"],
+    }
+    config_path = os.path.join(directory, "sources.json")
+    with open(config_path, "w") as f:
+        json.dump(config, f, indent=2)
+    return config_path, documents
+
+
+def make_queries(documents, count, seed=0):
+    """
+    Sample questions about the documents.
+
+    Each query is an eight-word window of a document sentence around the
+    rare identifier it contains, which is the expected text.
+
+    Returns:
+        list[tuple]: (query, expected text) pairs.
+    """
+    rng = random.Random(seed)
+    sentences = [
+        sentence.strip()
+        for text in documents.values()
+        for line in text.replace(PAGE_BREAK, "\n").split("\n")
+        for sentence in line.split(".")
+        if len(sentence.split()) >= 10
+    ]
+    queries = []
+    for sentence in rng.sample(sentences, min(count, len(sentences))):
+        words = sentence.split()
+        position = next(i for i, word in enumerate(words) if any(c.isdigit() for c in word))
+        window = words[max(0, position - 4):position + 4]
+        queries.append((" ".join(window) + "?", words[position]))
+    return queries
+
+
+def make_chunks(count, seed=0):
+    """
+    Generate standalone chunk texts for index and search throughput tests.
+
+    Returns:
+        list[str]: count chunks of three sentences each.
+    """
+    rng = random.Random(seed)
+    return [" ".join(_sentence(rng) for _ in range(3)) for _ in range(count)]
@@ -1,20 +1,231 @@
+import json
+import os
+import sqlite3
+import threading
+import time
 import uuid
-from langchain_core.chat_message_histories import ChatMessageHistory
+from collections import OrderedDict
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import message_to_dict, messages_from_dict
+
+
+class BoundedChatMessageHistory(BaseChatMessageHistory):
+    """
+    In-memory chat history that keeps only the most recent messages.
+    """
+    def __init__(self, max_messages=50):
+        """
+        Initialize an empty history.
+
+        Args:
+            max_messages (int, optional): Maximum number of messages kept.
+        """
+        self.messages = []
+        self.max_messages = max_messages
+
+    def add_message(self, message):
+        self.messages.append(message)
+        if len(self.messages) > self.max_messages:
+            del self.messages[:len(self.messages) - self.max_messages]
+
+    def clear(self):
+        self.messages = []
+
+
+class SQLiteChatMessageHistory(BaseChatMessageHistory):
+    """
+    Chat history of a single session stored in a SQLiteSessionBackend.
+    """
+    def __init__(self, backend, session_id):
+        self.backend = backend
+        self.session_id = session_id
+
+    @property
+    def messages(self):
+        return self.backend.load_messages(self.session_id)
+
+    def add_message(self, message):
+        self.backend.append_message(self.session_id, message)
+
+    def clear(self):
+        self.backend.clear_messages(self.session_id)
+
+
+class InMemorySessionBackend:
+    """
+    Session store kept in process memory with LRU and idle-TTL eviction.
+    """
+    def __init__(self, max_sessions=1000, idle_ttl=3600, max_messages=50):
+        """
+        Initialize the in-memory backend.
+
+        Args:
+            max_sessions (int, optional): Maximum number of live sessions.
+            idle_ttl (float, optional): Seconds of inactivity before a session is dropped.
+            max_messages (int, optional): Maximum number of messages per session.
+        """
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.evictions = 0
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Sessions are ordered by last access, so expired ones are at the front
+        while self._sessions:
+            session_id, (last_access, _) = next(iter(self._sessions.items()))
+            if now - last_access <= self.idle_ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            history = entry[1] if entry else BoundedChatMessageHistory(self.max_messages)
+            self._sessions[session_id] = (now, history)
+            self._evict(now)
+            return history
+
+    def reset(self, session_id):
+        with self._lock:
+            self._sessions[session_id] = (time.time(), BoundedChatMessageHistory(self.max_messages))
+            self._sessions.move_to_end(session_id)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionBackend:
+    """
+    Session store persisted in a local SQLite database.
+
+    The database survives restarts and, in WAL mode, can be shared by
+    several worker processes on the same host.
+    """
+    def __init__(self, path="sessions.db", max_sessions=1000, idle_ttl=3600, max_messages=50, sweep_interval=60):
+        """
+        Initialize the SQLite backend.
+
+        Args:
+            path (str, optional): Database file.
+            max_sessions (int, optional): Maximum number of stored sessions.
+            idle_ttl (float, optional): Seconds of inactivity before a session is dropped.
+            max_messages (int, optional): Maximum number of messages per session.
+            sweep_interval (float, optional): Minimum seconds between eviction sweeps.
+        """
+        self.path = path
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._last_sweep = 0.0
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, message TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+
+    def _connection(self):
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def _sweep(self, conn, now):
+        if now - self._last_sweep < self.sweep_interval:
+            return
+        self._last_sweep = now
+        conn.execute("DELETE FROM sessions WHERE last_access < ?", (now - self.idle_ttl,))
+        conn.execute(
+            "DELETE FROM sessions WHERE session_id IN ("
+            "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,)
+        )
+        conn.execute("DELETE FROM messages WHERE session_id NOT IN (SELECT session_id FROM sessions)")
+
+    def get(self, session_id):
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, last_access) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access",
+                (session_id, now)
+            )
+            self._sweep(conn, now)
+        return SQLiteChatMessageHistory(self, session_id)
+
+    def reset(self, session_id):
+        self.clear_messages(session_id)
+
+    def load_messages(self, session_id):
+        rows = self._connection().execute(
+            "SELECT message FROM messages WHERE session_id = ? ORDER BY id",
+            (session_id,)
+        ).fetchall()
+        return messages_from_dict([json.loads(row[0]) for row in rows])
+
+    def append_message(self, session_id, message):
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO messages (session_id, message) VALUES (?, ?)",
+                (session_id, json.dumps(message_to_dict(message)))
+            )
+            conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id NOT IN ("
+                "SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_messages)
+            )
+
+    def clear_messages(self, session_id):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+    def __len__(self):
+        return self._connection().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
 
 class ChatHandler:
     """
     Manages chat sessions and interactions.
     """
-    def __init__(self):
+    def __init__(self, max_sessions=1000, idle_ttl=3600, max_messages=50, backend=None):
         """
         Initialize the chat handler with a session store.
+
+        Args:
+            max_sessions (int, optional): Maximum number of live sessions.
+            idle_ttl (float, optional): Seconds of inactivity before a session is dropped.
+            max_messages (int, optional): Maximum number of messages kept per session.
+            backend (optional): Session backend, e.g. SQLiteSessionBackend.
+                Defaults to an InMemorySessionBackend with the limits above.
         """
-        self.store = {}
+        self.store = backend or InMemorySessionBackend(
+            max_sessions=max_sessions,
+            idle_ttl=idle_ttl,
+            max_messages=max_messages
+        )
 
     def generate_session_id(self):
         """
         Generate a unique session ID for each conversation.
-        
+
         Returns:
             str: Unique session identifier.
         """
@@ -23,23 +234,21 @@ class ChatHandler:
     def get_session_history(self, session_id):
         """
         Retrieve or create a chat session history.
-        
+
         Args:
             session_id (str): Session identifier.
-        
+
         Returns:
-            ChatMessageHistory: Session's message history.
+            BaseChatMessageHistory: Session's message history.
         """
-        if session_id not in self.store:
-            self.store[session_id] = ChatMessageHistory()
-        return self.store[session_id]
+        return self.store.get(session_id)
 
     def reset_session_history(self, session_id):
         """
         Reset the chat history for a specific session.
-        
+
         Args:
             session_id (str): Session identifier to reset.
         """
-        self.store[session_id] = ChatMessageHistory()
-        print(f"Chat history for session '{session_id}' has been reset.")
\ No newline at end of file
+        self.store.reset(session_id)
+        print(f"Chat history for session '{session_id}' has been reset.")
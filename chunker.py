@@ -0,0 +1,284 @@
+import math
+import re
+from collections import Counter
+
+from tokens import count_tokens
+
+# Page separator inserted between the pages of an extracted PDF
+PAGE_BREAK = "\f"
+
+
+def is_heading(line):
+    """
+    Whether a line looks like a section heading: a short all-caps line or a
+    short line ending with a colon.
+    """
+    line = line.strip()
+    if not line or len(line) > 60:
+        return False
+    letters = re.sub(r"[^A-Za-z]", "", line)
+    return (len(letters) >= 3 and letters.isupper()) or line.endswith(":")
+
+
+def _signature(line):
+    # Page numbers and dates vary between otherwise identical headers/footers
+    return re.sub(r"\d+", "#", " ".join(line.lower().split()))
+
+
+def _shingles(text, size=3):
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _prefix(shingles, threshold):
+    """
+    Shingles that any set with Jaccard similarity >= threshold must share.
+
+    Two sets this similar always have a shingle in common among the first
+    len - ceil(threshold * len) + 1 of each, in any fixed order, so only
+    chunks sharing a prefix shingle need to be compared.
+    """
+    # The small epsilon keeps float error from shortening the prefix
+    length = len(shingles) - math.ceil(threshold * len(shingles) - 1e-9) + 1
+    return sorted(shingles, key=hash)[:max(0, length)]
+
+
+class TokenChunker:
+    """
+    Splits documents into chunks sized in tokens that follow the document's
+    structure.
+
+    Chunks end at headings, paragraph or line boundaries, and never mix the
+    content of two sections unless both fit. Lines repeated at the top or
+    bottom of most PDF pages (running headers and footers) are dropped, as
+    are chunks that are near-duplicates of an earlier chunk. Every chunk
+    records the pages it came from.
+    """
+    def __init__(self, chunk_tokens=300, overlap_tokens=0, edge_lines=2,
+                 repeat_ratio=0.5, dedup_threshold=0.9):
+        """
+        Initialize the chunker.
+
+        Args:
+            chunk_tokens (int, optional): Maximum tokens per chunk.
+            overlap_tokens (int, optional): Tokens of trailing lines repeated at the
+                start of the next chunk within a section.
+            edge_lines (int, optional): Lines at the top and bottom of each page
+                checked for running headers and footers.
+            repeat_ratio (float, optional): Share of pages a line must appear on to
+                count as a header or footer.
+            dedup_threshold (float, optional): Jaccard similarity of word trigrams
+                above which a chunk is dropped as a near-duplicate.
+        """
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.edge_lines = edge_lines
+        self.repeat_ratio = repeat_ratio
+        self.dedup_threshold = dedup_threshold
+
+    def settings(self):
+        """
+        Settings that determine the chunks, for use in cache keys.
+
+        Returns:
+            dict: Chunker name and parameters.
+        """
+        return {
+            "chunker": "token",
+            "chunk_tokens": self.chunk_tokens,
+            "overlap_tokens": self.overlap_tokens,
+            "edge_lines": self.edge_lines,
+            "repeat_ratio": self.repeat_ratio,
+            "dedup_threshold": self.dedup_threshold,
+        }
+
+    def _page_lines(self, text):
+        """
+        Non-blank lines of each page, with running headers and footers removed.
+
+        Blank lines are kept as None to mark paragraph boundaries.
+        """
+        pages = []
+        for page in text.split(PAGE_BREAK):
+            lines = [line if line.strip() else None for line in page.split("\n")]
+            while lines and lines[-1] is None:
+                lines.pop()
+            while lines and lines[0] is None:
+                lines.pop(0)
+            pages.append(lines)
+
+        if len(pages) < 3:
+            return pages
+
+        counts = Counter()
+        for lines in pages:
+            content = [line for line in lines if line is not None]
+            edges = content[:self.edge_lines] + content[-self.edge_lines:]
+            counts.update({_signature(line) for line in edges})
+        repeated = {
+            signature for signature, count in counts.items()
+            if count >= max(2, self.repeat_ratio * len(pages))
+        }
+
+        cleaned = []
+        for lines in pages:
+            content = [i for i, line in enumerate(lines) if line is not None]
+            edges = set(content[:self.edge_lines] + content[-self.edge_lines:])
+            cleaned.append([
+                line for i, line in enumerate(lines)
+                if not (i in edges and _signature(line) in repeated)
+            ])
+        return cleaned
+
+    def _split_line(self, line, budget):
+        """
+        Split a line longer than budget tokens on word boundaries.
+        """
+        pieces, current, size = [], [], 0
+        for word in line.split():
+            cost = count_tokens(word)
+            if current and size + cost > budget:
+                pieces.append(" ".join(current))
+                current, size = [], 0
+            current.append(word)
+            size += cost
+        if current:
+            pieces.append(" ".join(current))
+        return pieces
+
+    def _sections(self, text):
+        """
+        Group lines into sections, each a list of (line, page, tokens, paragraph start).
+        """
+        sections, current = [], []
+        for page_number, lines in enumerate(self._page_lines(text), start=1):
+            paragraph_start = True
+            for line in lines:
+                if line is None:
+                    paragraph_start = True
+                    continue
+                if is_heading(line) and current:
+                    sections.append(current)
+                    current = []
+                if count_tokens(line) <= self.chunk_tokens:
+                    current.append((line, page_number, count_tokens(line), paragraph_start))
+                    paragraph_start = False
+                    continue
+                # A heading followed by an over-long line would be packed into a
+                # chunk of its own, so it is repeated at the top of every piece
+                heading = None
+                if len(current) == 1 and is_heading(current[0][0]) and current[0][2] <= self.chunk_tokens // 2:
+                    heading = current.pop()
+                    paragraph_start = heading[3]
+                budget = self.chunk_tokens - (count_tokens(heading[0] + "\n") if heading else 0)
+                for piece in self._split_line(line, budget):
+                    if heading:
+                        piece = f"{heading[0]}\n{piece}"
+                    current.append((piece, page_number, count_tokens(piece), paragraph_start))
+                    paragraph_start = False
+        if current:
+            sections.append(current)
+        return sections
+
+    def _pack(self, sections):
+        chunks, current, size = [], [], 0
+        for section in sections:
+            section_size = sum(tokens for _, _, tokens, _ in section)
+            # Start a new chunk at the heading rather than splitting a section that would fit
+            if current and size + section_size > self.chunk_tokens:
+                chunks.append(current)
+                current, size = [], 0
+            section_start = len(current)
+            for entry in section:
+                tokens = entry[2]
+                if current and size + tokens > self.chunk_tokens:
+                    # Break at the section's last paragraph start, unless that leaves a small chunk
+                    break_at = len(current)
+                    for i in range(len(current) - 1, section_start, -1):
+                        if current[i][3]:
+                            if sum(t for _, _, t, _ in current[:i]) >= self.chunk_tokens // 2:
+                                break_at = i
+                            break
+                    head, carried = current[:break_at], current[break_at:]
+                    chunks.append(head)
+                    current = self._overlap(head) + carried
+                    section_start = len(current) - len(carried)
+                    size = sum(t for _, _, t, _ in current)
+                    if not carried:
+                        # Trim the overlap rather than emit a chunk of nothing but repeated lines
+                        while current and size + tokens > self.chunk_tokens:
+                            size -= current.pop(0)[2]
+                        section_start = len(current)
+                    if current and size + tokens > self.chunk_tokens:
+                        chunks.append(current)
+                        current, size, section_start = [], 0, 0
+                current.append(entry)
+                size += tokens
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _overlap(self, lines):
+        overlap, size = [], 0
+        if not self.overlap_tokens:
+            return overlap
+        for entry in reversed(lines):
+            if size + entry[2] > self.overlap_tokens:
+                break
+            overlap.insert(0, entry)
+            size += entry[2]
+        return overlap
+
+    def chunk(self, text):
+        """
+        Split a document into chunks with page provenance.
+
+        Args:
+            text (str): Document text; PDF pages are separated by PAGE_BREAK.
+
+        Returns:
+            list[dict]: Chunks in document order, each with "text", "page_start",
+                "page_end" and "tokens".
+        """
+        chunks, seen, kept_shingles = [], set(), []
+        # Prefix shingle -> kept chunks it starts, so each chunk is only
+        # compared with the few kept chunks that could be near-duplicates
+        candidates_by_shingle = {}
+        for entries in self._pack(self._sections(text or "")):
+            chunk_text = "\n".join(line for line, _, _, _ in entries)
+            signature = " ".join(chunk_text.lower().split())
+            if signature in seen:
+                continue
+            shingles = _shingles(chunk_text)
+            prefix = _prefix(shingles, self.dedup_threshold)
+            candidates = {i for shingle in prefix for i in candidates_by_shingle.get(shingle, ())}
+            if any(
+                len(shingles & kept_shingles[i]) / len(shingles | kept_shingles[i]) >= self.dedup_threshold
+                for i in candidates
+            ):
+                continue
+            seen.add(signature)
+            for shingle in prefix:
+                candidates_by_shingle.setdefault(shingle, []).append(len(kept_shingles))
+            kept_shingles.append(shingles)
+            chunks.append({
+                "text": chunk_text,
+                "page_start": entries[0][1],
+                "page_end": entries[-1][1],
+                "tokens": sum(tokens for _, _, tokens, _ in entries),
+            })
+        return chunks
+
+    def split_text(self, text):
+        """
+        Split a document into chunk texts, like a LangChain text splitter.
+
+        Args:
+            text (str): Document text.
+
+        Returns:
+            list[str]: Chunk texts in document order.
+        """
+        return [chunk["text"] for chunk in self.chunk(text)]
@@ -0,0 +1,226 @@
+import threading
+
+from chunker import is_heading
+from tokens import count_tokens, truncate_tokens
+
+
+def split_sections(text, max_tokens=250):
+    """
+    Split a document into section-level chunks.
+
+    A new section starts at every heading-like line (short all-caps lines or
+    lines ending with a colon). Sections longer than max_tokens are split
+    further on line boundaries.
+
+    Args:
+        text (str): Document text.
+        max_tokens (int, optional): Maximum tokens per chunk.
+
+    Returns:
+        list[str]: Chunks in document order.
+    """
+    sections = []
+    current = []
+    for line in text.splitlines():
+        if is_heading(line) and current:
+            sections.append(current)
+            current = []
+        if line.strip():
+            current.append(line)
+    if current:
+        sections.append(current)
+
+    chunks = []
+    for lines in sections:
+        chunk, size = [], 0
+        for line in lines:
+            cost = count_tokens(line)
+            if chunk and size + cost > max_tokens:
+                chunks.append("\n".join(chunk))
+                chunk, size = [], 0
+            chunk.append(line)
+            size += cost
+        if chunk:
+            chunks.append("\n".join(chunk))
+    return chunks
+
+
+class ContextPacker:
+    """
+    Selects the most relevant chunks of a document for a query, up to a
+    token budget, instead of pasting the whole document into the prompt.
+
+    Every document lives in one shared index; searches are restricted to a
+    document by filtering on the "source" metadata of its chunks. Documents
+    can be added at any time; the shared index and the chunk lists it points
+    into are published together as one snapshot, which every call reads once.
+    """
+    def __init__(self, vector_store_manager, token_budget=1500, section_tokens=250, candidates=20):
+        """
+        Initialize the context packer.
+
+        Args:
+            vector_store_manager (VectorStoreManager): Builds and searches the index.
+            token_budget (int, optional): Default maximum tokens of packed context.
+            section_tokens (int, optional): Maximum tokens per section chunk.
+            candidates (int, optional): Number of ranked sections considered per query.
+        """
+        self.vector_store_manager = vector_store_manager
+        self.token_budget = token_budget
+        self.section_tokens = section_tokens
+        self.candidates = candidates
+        # (shared index, sources) pair, replaced as a whole and never mutated
+        self._snapshot = (None, {})
+        self._lock = threading.Lock()
+
+    def _chunk(self, text, chunking):
+        """
+        Chunk a document.
+
+        Returns:
+            tuple: (chunk texts, extra metadata per chunk)
+        """
+        if chunking == "sections":
+            chunks = split_sections(text, self.section_tokens)
+            return chunks, [{} for _ in chunks]
+        chunks = self.vector_store_manager.text_splitter.chunk(text)
+        return (
+            [chunk["text"] for chunk in chunks],
+            [{"page_start": chunk["page_start"], "page_end": chunk["page_end"]} for chunk in chunks]
+        )
+
+    def has_source(self, name):
+        """
+        Whether a source has been added.
+        """
+        return name in self._snapshot[1]
+
+    def add_sources(self, documents, chunking):
+        """
+        Chunk and embed documents, then rebuild the shared index with them.
+
+        Each document is embedded into its own (index-cached) store first;
+        the new shared index is then merged from the current one, minus the
+        replaced sources, and those stores without re-embedding anything.
+        Only the shared index is kept.
+
+        Args:
+            documents (dict): Maps source names to document texts.
+            chunking (dict): Maps source names to "sections" (packed up to a
+                token budget with pack()) or "splitter" (retrieved by relevance
+                with retrieve()).
+        """
+        sources, stores = {}, {}
+        for name, text in documents.items():
+            text = text or ""
+            chunks, provenance = self._chunk(text, chunking.get(name, "sections"))
+            sources[name] = {
+                "text": text,
+                "chunks": chunks,
+                "tokens": [count_tokens(chunk) for chunk in chunks],
+            }
+            if chunks:
+                stores[name] = self.vector_store_manager.create_vector_store_from_chunks(
+                    chunks,
+                    metadatas=[{"source": name, "chunk": i, **extra} for i, extra in enumerate(provenance)],
+                    lexical=False
+                )
+
+        with self._lock:
+            current = self._snapshot[0]
+            vector_store = self.vector_store_manager.merge_vector_stores(
+                ([current] if current is not None else []) + list(stores.values()),
+                # The chunks of re-added sources are replaced by the new stores
+                exclude=lambda store, doc: store is current and doc.metadata.get("source") in sources
+            )
+            self._snapshot = (vector_store, {**self._snapshot[1], **sources})
+
+    @property
+    def vector_store(self):
+        """
+        The current shared index.
+        """
+        return self._snapshot[0]
+
+    def _assemble(self, source, ranked_docs, budget):
+        selected, used = set(), 0
+        for doc in ranked_docs:
+            index = doc.metadata["chunk"]
+            cost = source["tokens"][index]
+            if index in selected or used + cost > budget:
+                continue
+            selected.add(index)
+            used += cost
+        if not selected and ranked_docs:
+            # Every section is over budget: a cut-down top section beats no context
+            return truncate_tokens(source["chunks"][ranked_docs[0].metadata["chunk"]], budget)
+        # Keep the selected sections in document order
+        return "\n\n".join(source["chunks"][i] for i in sorted(selected))
+
+    def pack(self, query, name, budget=None):
+        """
+        Pack the most relevant sections of a source for a query.
+
+        Documents that fit in the budget are returned whole.
+
+        Args:
+            query (str): User's question.
+            name (str): Source name given to build().
+            budget (int, optional): Maximum tokens; defaults to token_budget.
+
+        Returns:
+            str: Packed context.
+        """
+        vector_store, sources = self._snapshot
+        source = sources[name]
+        budget = budget or self.token_budget
+        if sum(source["tokens"]) <= budget:
+            return source["text"]
+        ranked_docs = self.vector_store_manager.search_documents(
+            query, vector_store, top_k=self.candidates, filter={"source": name}
+        )
+        return self._assemble(source, ranked_docs, budget)
+
+    async def apack(self, query, name, budget=None):
+        """
+        Async variant of pack().
+        """
+        vector_store, sources = self._snapshot
+        source = sources[name]
+        budget = budget or self.token_budget
+        if sum(source["tokens"]) <= budget:
+            return source["text"]
+        ranked_docs = await self.vector_store_manager.asearch_documents(
+            query, vector_store, top_k=self.candidates, filter={"source": name}
+        )
+        return self._assemble(source, ranked_docs, budget)
+
+    def retrieve(self, query, name, top_k=5):
+        """
+        Retrieve the top_k most relevant chunks of a source, best first.
+
+        Args:
+            query (str): User's question.
+            name (str): Source name given to build().
+            top_k (int, optional): Number of chunks.
+
+        Returns:
+            str: Retrieved context.
+        """
+        vector_store, sources = self._snapshot
+        if not sources[name]["chunks"]:
+            return ""
+        return self.vector_store_manager.retrieve_relevant_chunks(
+            query, vector_store, top_k=top_k, filter={"source": name}
+        )
+
+    async def aretrieve(self, query, name, top_k=5):
+        """
+        Async variant of retrieve().
+        """
+        vector_store, sources = self._snapshot
+        if not sources[name]["chunks"]:
+            return ""
+        return await self.vector_store_manager.aretrieve_relevant_chunks(
+            query, vector_store, top_k=top_k, filter={"source": name}
+        )
@@ -0,0 +1,80 @@
+import os
+import threading
+
+
+class DocumentWatcher:
+    """
+    Polls document files and reports which documents changed.
+
+    Polling the size and modification time of a handful of files is cheap
+    and needs no platform-specific file notification support.
+    """
+    def __init__(self, paths, on_change, interval=5.0):
+        """
+        Initialize the watcher.
+
+        Args:
+            paths (callable): Returns a dict mapping document names to lists of file paths.
+            on_change (callable): Called with the set of changed document names.
+            interval (float, optional): Seconds between polls.
+        """
+        self.paths = paths
+        self.on_change = on_change
+        self.interval = interval
+        self._snapshot = self._stat_all()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # Missing files (e.g. mid-replace) count as a state of their own
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _stat_all(self):
+        return {
+            name: tuple(self._stat(path) for path in files)
+            for name, files in self.paths().items()
+        }
+
+    def check(self):
+        """
+        Poll once and report any changes.
+
+        Returns:
+            set: Names of the documents whose files changed since the last poll.
+        """
+        snapshot = self._stat_all()
+        changed = {name for name, stats in snapshot.items() if self._snapshot.get(name) != stats}
+        if changed:
+            self.on_change(changed)
+        # Only advance once handled, so a failed reload is retried on the next poll
+        self._snapshot = snapshot
+        return changed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Document reload failed: {e}")
+
+    def start(self):
+        """
+        Start polling on a daemon thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="document-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """
+        Stop polling.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,224 @@
+import hashlib
+import inspect
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from tracing import tracer
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic, offline embedding backend based on feature hashing.
+
+    Every token and token bigram is hashed into a fixed-size vector, which is
+    then L2-normalised. It needs no network access or model weights, so it
+    can stand in for the remote embedding model in tests and benchmarks.
+    """
+    def __init__(self, dimensions=384, model="hashing"):
+        """
+        Initialize the hashing embedder.
+
+        Args:
+            dimensions (int, optional): Size of the output vectors.
+            model (str, optional): Name reported in cache keys.
+        """
+        self.dimensions = dimensions
+        self.model = model
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        tokens = re.findall(r"[a-z0-9]+", text.lower())
+        features = tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            digest = hashlib.md5(feature.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dimensions
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[index] += sign
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps an embedding backend with a bounded LRU cache of query embeddings.
+
+    A single instance is shared by every vector store, the intent router and
+    the response cache, so a query is embedded at most once while it stays
+    in the cache. Document embeddings are passed straight through.
+    """
+    def __init__(self, embedder, max_entries=1024):
+        """
+        Initialize the cache.
+
+        Args:
+            embedder (Embeddings): Backend used on cache misses.
+            max_entries (int, optional): Maximum number of cached query embeddings.
+        """
+        self.embedder = embedder
+        self.model = getattr(embedder, "model", type(embedder).__name__)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, text):
+        with self._lock:
+            vector = self._cache.get(text)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(text)
+            self.hits += 1
+            return vector
+
+    def _put(self, text, vector):
+        with self._lock:
+            self._cache[text] = vector
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def embed_documents(self, texts):
+        return self.embedder.embed_documents(texts)
+
+    async def aembed_documents(self, texts):
+        return await self.embedder.aembed_documents(texts)
+
+    def embed_query(self, text):
+        with tracer.span("embed_query") as span:
+            vector = self._get(text)
+            span.set("cache_hit", vector is not None)
+            if vector is None:
+                vector = self.embedder.embed_query(text)
+                self._put(text, vector)
+            return vector
+
+    async def aembed_query(self, text):
+        with tracer.span("embed_query") as span:
+            vector = self._get(text)
+            span.set("cache_hit", vector is not None)
+            if vector is None:
+                vector = await self.embedder.aembed_query(text)
+                self._put(text, vector)
+            return vector
+
+    def embed_queries(self, texts):
+        """
+        Embed many queries, sending all cache misses in one request.
+
+        Args:
+            texts (list[str]): Queries to embed.
+
+        Returns:
+            list[list[float]]: One embedding per query.
+        """
+        vectors = [self._get(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            # Ask for query-type embeddings where the backend distinguishes them
+            if "task_type" in inspect.signature(self.embedder.embed_documents).parameters:
+                embedded = self.embedder.embed_documents(missing, task_type="retrieval_query")
+            else:
+                embedded = self.embedder.embed_documents(missing)
+            fresh = dict(zip(missing, embedded))
+            for text, vector in fresh.items():
+                self._put(text, vector)
+            vectors = [vector if vector is not None else fresh[text] for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def stats(self):
+        """
+        Cache statistics.
+
+        Returns:
+            dict: hits, misses, current size and hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class EmbeddingPipeline:
+    """
+    Embeds text chunks in batches on a bounded worker pool.
+
+    Works with any object implementing the LangChain Embeddings interface
+    (embed_documents / embed_query).
+    """
+    def __init__(self, embedder, batch_size=32, max_workers=4, max_retries=3, retry_delay=1.0):
+        """
+        Initialize the embedding pipeline.
+
+        Args:
+            embedder (Embeddings): Backend used to embed each batch.
+            batch_size (int, optional): Number of chunks per embedding request.
+            max_workers (int, optional): Maximum number of concurrent requests.
+            max_retries (int, optional): Attempts per batch before giving up.
+            retry_delay (float, optional): Base delay in seconds between retries.
+        """
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.last_stats = {}
+
+    def _embed_batch(self, batch):
+        for attempt in range(self.max_retries):
+            try:
+                return self.embedder.embed_documents(batch)
+            except Exception:
+                if attempt == self.max_retries - 1:
+                    raise
+                # Exponential backoff with jitter
+                time.sleep(self.retry_delay * (2 ** attempt) * (0.5 + random.random()))
+
+    def embed(self, texts):
+        """
+        Embed a list of texts, preserving order.
+
+        Args:
+            texts (list[str]): Texts to embed.
+
+        Returns:
+            list[list[float]]: One embedding per input text.
+        """
+        start = time.perf_counter()
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+        if len(batches) <= 1 or self.max_workers <= 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+                results = list(executor.map(self._embed_batch, batches))
+
+        vectors = [vector for batch in results for vector in batch]
+        elapsed = time.perf_counter() - start
+        self.last_stats = {
+            "texts": len(texts),
+            "batches": len(batches),
+            "seconds": elapsed,
+            "texts_per_second": len(texts) / elapsed if elapsed > 0 else float("inf"),
+        }
+        return vectors
@@ -0,0 +1,66 @@
+"""
+Drivers for request flows written once for both the sync and async APIs.
+
+A flow is a generator that does no I/O itself. Whenever it needs a model
+call, an embedding or another blocking operation it yields a
+(step name, args) pair, and the driver runs that step and sends the
+result back. A step that raises is thrown into the flow at the same
+point. run_flow runs the steps synchronously and arun_flow awaits them,
+so the logic between the steps, such as caching, tracing and
+bookkeeping, exists only once.
+"""
+
+
+def run_flow(flow, steps):
+    """
+    Run a flow with synchronous steps.
+
+    Args:
+        flow (generator): Yields (step name, args) pairs.
+        steps (dict): Maps step names to callables.
+
+    Returns:
+        object: The flow's return value.
+    """
+    value = error = None
+    try:
+        while True:
+            try:
+                step, args = flow.throw(error) if error is not None else flow.send(value)
+            except StopIteration as stop:
+                return stop.value
+            value = error = None
+            try:
+                value = steps[step](*args)
+            except Exception as e:
+                error = e
+    finally:
+        # Unwinds the flow's context managers (e.g. spans) if a step was interrupted
+        flow.close()
+
+
+async def arun_flow(flow, steps):
+    """
+    Run a flow with async steps.
+
+    Args:
+        flow (generator): Yields (step name, args) pairs.
+        steps (dict): Maps step names to coroutine functions.
+
+    Returns:
+        object: The flow's return value.
+    """
+    value = error = None
+    try:
+        while True:
+            try:
+                step, args = flow.throw(error) if error is not None else flow.send(value)
+            except StopIteration as stop:
+                return stop.value
+            value = error = None
+            try:
+                value = await steps[step](*args)
+            except Exception as e:
+                error = e
+    finally:
+        flow.close()
@@ -0,0 +1,149 @@
+import threading
+import time
+from collections import OrderedDict
+
+from tokens import count_tokens
+
+
+def _format_messages(messages):
+    return "\n".join(f"{message.type}: {message.content}" for message in messages)
+
+
+class HistoryManager:
+    """
+    Builds token-budgeted chat history for agent prompts.
+
+    The last keep_last_turns turns are kept verbatim. Older turns are folded
+    into a rolling summary that is cached per session and only extended when
+    at least fold_batch new messages have fallen out of the window. Cached
+    summaries are evicted with the same LRU and idle-TTL limits as sessions;
+    an evicted summary is rebuilt if its session comes back.
+    """
+    def __init__(self, summarizer=None, keep_last_turns=3, fold_batch=4, max_summary_tokens=300,
+                 max_sessions=1000, idle_ttl=3600):
+        """
+        Initialize the history manager.
+
+        Args:
+            summarizer (Runnable, optional): Chain taking "summary", "new_lines" and
+                "max_tokens" and returning an updated summary. Without it, older turns are dropped.
+            keep_last_turns (int, optional): Number of recent turns kept verbatim.
+            fold_batch (int, optional): Minimum number of older messages folded at once.
+            max_summary_tokens (int, optional): Upper bound on the summary length.
+            max_sessions (int, optional): Maximum number of cached summaries.
+            idle_ttl (float, optional): Seconds after its last use before a summary is dropped.
+        """
+        self.summarizer = summarizer
+        self.keep_last_turns = keep_last_turns
+        self.fold_batch = fold_batch
+        self.max_summary_tokens = max_summary_tokens
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        # session_id -> (last access, signature of the last folded message, summary)
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Summaries are ordered by last access, so expired ones are at the front
+        while self._summaries:
+            last_access = next(iter(self._summaries.values()))[0]
+            if now - last_access <= self.idle_ttl and len(self._summaries) <= self.max_sessions:
+                break
+            self._summaries.popitem(last=False)
+
+    def _split(self, session_id, messages):
+        """
+        Split messages into (summary, unfolded older messages, recent messages).
+        """
+        keep = self.keep_last_turns * 2
+        older, recent = (messages[:-keep], messages[-keep:]) if keep else (messages, [])
+        if not older:
+            return "", [], recent
+
+        now = time.time()
+        with self._lock:
+            entry = self._summaries.pop(session_id, None)
+            if entry is not None:
+                self._summaries[session_id] = (now, *entry[1:])
+            self._evict(now)
+        _, signature, summary = entry or (None, None, "")
+        # Older messages are trimmed from the front, so everything after the
+        # last folded message (or all of them, if it was trimmed) is unfolded
+        start = 0
+        for i in range(len(older) - 1, -1, -1):
+            if (older[i].type, older[i].content) == signature:
+                start = i + 1
+                break
+        return summary, older[start:], recent
+
+    def _summarizer_input(self, summary, unfolded):
+        return {
+            "summary": summary,
+            "new_lines": _format_messages(unfolded),
+            "max_tokens": self.max_summary_tokens,
+        }
+
+    def _store(self, session_id, folded, summary):
+        last = folded[-1]
+        now = time.time()
+        with self._lock:
+            self._summaries.pop(session_id, None)
+            self._summaries[session_id] = (now, (last.type, last.content), summary)
+            self._evict(now)
+
+    def _render(self, summary, verbatim, budget):
+        summary_text = f"Summary of earlier conversation: {summary}\n" if summary else ""
+        remaining = budget - count_tokens(summary_text)
+        lines = []
+        for message in reversed(verbatim):
+            line = f"{message.type}: {message.content}"
+            cost = count_tokens(line)
+            if cost > remaining:
+                break
+            lines.append(line)
+            remaining -= cost
+        return summary_text + "\n".join(reversed(lines))
+
+    def window(self, session_id, messages, budget):
+        """
+        Render the chat history of a session within a token budget.
+
+        Args:
+            session_id (str): Session identifier, used to cache the summary.
+            messages (list[BaseMessage]): Full stored history of the session.
+            budget (int): Maximum number of tokens of history to return.
+
+        Returns:
+            str: Rolling summary followed by the most recent turns that fit.
+        """
+        summary, unfolded, recent = self._split(session_id, messages)
+        if self.summarizer is not None and len(unfolded) >= self.fold_batch:
+            summary = self.summarizer.invoke(self._summarizer_input(summary, unfolded))
+            self._store(session_id, unfolded, summary)
+            unfolded = []
+        elif self.summarizer is None:
+            unfolded = []
+        return self._render(summary, unfolded + recent, budget)
+
+    async def awindow(self, session_id, messages, budget):
+        """
+        Async variant of window().
+        """
+        summary, unfolded, recent = self._split(session_id, messages)
+        if self.summarizer is not None and len(unfolded) >= self.fold_batch:
+            summary = await self.summarizer.ainvoke(self._summarizer_input(summary, unfolded))
+            self._store(session_id, unfolded, summary)
+            unfolded = []
+        elif self.summarizer is None:
+            unfolded = []
+        return self._render(summary, unfolded + recent, budget)
+
+    def forget(self, session_id):
+        """
+        Drop the cached summary of a session.
+
+        Args:
+            session_id (str): Session identifier.
+        """
+        with self._lock:
+            self._summaries.pop(session_id, None)
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import faiss
+import numpy as np
+from langchain.vectorstores import FAISS
+
+# Map index data instead of copying it into memory. IO_FLAG_MMAP_IFC maps
+# the codes of every index type, but cannot be combined with IO_FLAG_MMAP:
+# IVF loads then fail with "mmap only supported for File objects". Older
+# faiss versions only have IO_FLAG_MMAP, which maps IVF inverted lists.
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+
+class IndexCache:
+    """
+    Content-addressed on-disk cache of FAISS vector stores.
+
+    Each entry lives in its own directory named after a hash of the source
+    text, the splitter settings and the embedding model, so any change to
+    those inputs produces a new key and stale entries are simply never hit.
+
+    With mmap enabled, loaded indexes are memory-mapped read-only, so
+    processes that load the same entry share its pages through the OS page
+    cache instead of each holding a private copy.
+    """
+    def __init__(self, cache_dir=".index_cache", mmap=False):
+        """
+        Initialize the index cache.
+
+        Args:
+            cache_dir (str, optional): Directory holding cached indexes.
+            mmap (bool, optional): Memory-map loaded indexes read-only.
+        """
+        self.cache_dir = cache_dir
+        self.mmap = mmap
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(text, settings):
+        """
+        Build the cache key for a piece of text.
+
+        Args:
+            text (str): Source text that will be split and embedded.
+            settings (dict): Splitter and embedding settings (JSON-serialisable).
+
+        Returns:
+            str: Hex digest identifying the index.
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key, embeddings):
+        """
+        Load a cached vector store.
+
+        Args:
+            key (str): Cache key from make_key.
+            embeddings (Embeddings): Embedding model used for later queries.
+
+        Returns:
+            FAISS or None: The cached vector store, or None on a miss.
+        """
+        path = self._entry_path(key)
+        if not os.path.exists(os.path.join(path, "index.faiss")):
+            self.misses += 1
+            return None
+        try:
+            if self.mmap:
+                index = faiss.read_index(os.path.join(path, "index.faiss"), MMAP_FLAGS)
+                with open(os.path.join(path, "index.pkl"), "rb") as f:
+                    docstore, index_to_docstore_id = pickle.load(f)
+                vector_store = FAISS(embeddings, index, docstore, index_to_docstore_id)
+            else:
+                vector_store = FAISS.load_local(
+                    path,
+                    embeddings,
+                    allow_dangerous_deserialization=True
+                )
+        except Exception as e:
+            print(f"Error loading cached index {path}: {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return vector_store
+
+    def load_vectors(self, key):
+        """
+        Load the exact embeddings stored next to a compressed index.
+
+        Args:
+            key (str): Cache key from make_key.
+
+        Returns:
+            np.ndarray or None: Read-only memory-mapped float32 matrix, one row
+                per indexed chunk, or None if the entry has none.
+        """
+        path = os.path.join(self._entry_path(key), "vectors.npy")
+        if not os.path.exists(path):
+            return None
+        try:
+            return np.load(path, mmap_mode="r")
+        except Exception as e:
+            print(f"Error loading cached vectors {path}: {e}")
+            return None
+
+    def load_centroids(self, key):
+        """
+        Load cached route centroids of the intent router.
+
+        Args:
+            key (str): Cache key from make_key.
+
+        Returns:
+            tuple or None: (route labels, float32 centroid matrix), or None on a miss.
+        """
+        path = os.path.join(self._entry_path(key), "centroids.npz")
+        if not os.path.exists(path):
+            self.misses += 1
+            return None
+        try:
+            with np.load(path) as data:
+                routes, centroids = data["routes"].tolist(), data["centroids"]
+        except Exception as e:
+            print(f"Error loading cached centroids {path}: {e}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return routes, centroids
+
+    def save_centroids(self, key, routes, centroids):
+        """
+        Save route centroids of the intent router under the given key.
+
+        Args:
+            key (str): Cache key from make_key.
+            routes (list): Route labels, one per centroid row.
+            centroids (np.ndarray): Centroid matrix.
+        """
+        path = self._entry_path(key)
+        os.makedirs(path, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".tmp-", suffix=".npz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, routes=np.asarray(routes), centroids=np.asarray(centroids, dtype=np.float32))
+            os.replace(tmp_path, os.path.join(path, "centroids.npz"))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def save(self, key, vector_store, settings=None, vectors=None):
+        """
+        Save a vector store under the given key.
+
+        The index is written to a temporary directory first and moved into
+        place, so a crash mid-write never leaves a half-written entry.
+
+        Args:
+            key (str): Cache key from make_key.
+            vector_store (FAISS): Vector store to persist.
+            settings (dict, optional): Settings recorded next to the index.
+            vectors (np.ndarray, optional): Exact embeddings of a compressed
+                index, kept so it can be merged or rebuilt without quantising twice.
+        """
+        path = self._entry_path(key)
+        tmp_path = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-")
+        try:
+            vector_store.save_local(tmp_path)
+            if vectors is not None:
+                np.save(os.path.join(tmp_path, "vectors.npy"), np.asarray(vectors, dtype=np.float32))
+            with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+                json.dump({"key": key, "settings": settings or {}}, f)
+            if os.path.exists(path):
+                shutil.rmtree(path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                shutil.rmtree(tmp_path, ignore_errors=True)
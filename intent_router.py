@@ -0,0 +1,180 @@
+import asyncio
+import json
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class IntentRouter:
+    """
+    Local embedding-based classifier for the data identifier options.
+
+    Queries are scored against per-route centroids of labelled example
+    embeddings (see SourceRegistry.route_examples). Confident decisions are
+    made locally; ambiguous ones return no route so the caller can fall back
+    to the LLM data identifier agent.
+    """
+    def __init__(self, embeddings, examples, threshold=0.75, margin=0.05, history_size=1000,
+                 cache=None, model=None):
+        """
+        Initialize the intent router.
+
+        Args:
+            embeddings (Embeddings): Embedding backend for examples and queries;
+                a CachedEmbeddings embeds all examples in one request.
+            examples (dict): Maps each route label to example queries.
+            threshold (float, optional): Minimum cosine similarity to route locally.
+            margin (float, optional): Minimum lead of the best route over the runner-up.
+            history_size (int, optional): Number of recent decisions kept for tuning.
+            cache (IndexCache, optional): Keeps the centroids on disk so restarts
+                skip embedding the examples.
+            model (str, optional): Embedding model name, part of the cache key.
+        """
+        self.embeddings = embeddings
+        self.examples = examples
+        self.threshold = threshold
+        self.margin = margin
+        self.cache = cache
+        self.model = model or getattr(embeddings, "model", type(embeddings).__name__)
+        self.decisions = deque(maxlen=history_size)
+        self.local_routes = 0
+        self.fallbacks = 0
+        self._routes = None
+        self._centroids = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(matrix):
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    def fit(self):
+        """
+        Embed the labelled examples and compute one centroid per route.
+
+        Called lazily on first use so startup makes no embedding calls. With a
+        cache the centroids are reused until the examples or the embedding
+        model change.
+        """
+        routes = sorted(self.examples)
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache.make_key(
+                json.dumps({route: self.examples[route] for route in routes}),
+                {"model": self.model, "intent_centroids": True}
+            )
+            cached = self.cache.load_centroids(cache_key)
+            if cached is not None and cached[0] == routes:
+                self._routes, self._centroids = cached
+                return
+
+        texts = [text for route in routes for text in self.examples[route]]
+        # Examples are embedded as queries, the same way incoming questions
+        # are, so both sides live in the same (retrieval_query) space
+        if hasattr(self.embeddings, "embed_queries"):
+            vectors = self.embeddings.embed_queries(texts)
+        else:
+            vectors = [self.embeddings.embed_query(text) for text in texts]
+        vectors = self._normalize(np.asarray(vectors, dtype=np.float32))
+
+        centroids = []
+        offset = 0
+        for route in routes:
+            count = len(self.examples[route])
+            centroids.append(vectors[offset:offset + count].mean(axis=0))
+            offset += count
+        self._routes = routes
+        self._centroids = self._normalize(np.vstack(centroids))
+        if cache_key:
+            self.cache.save_centroids(cache_key, routes, self._centroids)
+
+    def ensure_fitted(self):
+        """
+        Fit the router unless it already has been; safe to call concurrently.
+        """
+        with self._lock:
+            if self._centroids is None:
+                self.fit()
+
+    def _score_vector(self, vector):
+        vector = self._normalize(np.asarray(vector, dtype=np.float32))
+        similarities = self._centroids @ vector
+        return dict(zip(self._routes, similarities.tolist()))
+
+    def scores(self, query):
+        """
+        Cosine similarity of a query to each route centroid.
+
+        Args:
+            query (str): User's question.
+
+        Returns:
+            dict: Maps each route label to its similarity score.
+        """
+        self.ensure_fitted()
+        return self._score_vector(self.embeddings.embed_query(query))
+
+    def _decide(self, query, scores):
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best_route, confidence = ranked[0]
+        lead = confidence - ranked[1][1] if len(ranked) > 1 else confidence
+        confident = confidence >= self.threshold and lead >= self.margin
+
+        decision = {
+            "query": query,
+            "route": best_route if confident else None,
+            "best_route": best_route,
+            "confidence": confidence,
+            "margin": lead,
+            "scores": scores,
+        }
+        with self._lock:
+            if confident:
+                self.local_routes += 1
+            else:
+                self.fallbacks += 1
+        self.decisions.append(decision)
+        return decision
+
+    def route(self, query):
+        """
+        Classify a query locally if the decision is confident enough.
+
+        Args:
+            query (str): User's question.
+
+        Returns:
+            dict: Decision with keys query, route (None when ambiguous),
+                best_route, confidence, margin and scores.
+        """
+        return self._decide(query, self.scores(query))
+
+    async def aroute(self, query):
+        """
+        Async variant of route() that embeds the query without blocking.
+
+        Args:
+            query (str): User's question.
+
+        Returns:
+            dict: Decision as returned by route().
+        """
+        if self._centroids is None:
+            await asyncio.get_running_loop().run_in_executor(None, self.ensure_fitted)
+        vector = await self.embeddings.aembed_query(query)
+        return self._decide(query, self._score_vector(vector))
+
+    def stats(self):
+        """
+        Summary of routing decisions made so far.
+
+        Returns:
+            dict: Local and fallback counts and the local routing rate.
+        """
+        total = self.local_routes + self.fallbacks
+        return {
+            "local_routes": self.local_routes,
+            "fallbacks": self.fallbacks,
+            "local_rate": self.local_routes / total if total else 0.0,
+        }
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+
+
+class LazyResource:
+    """
+    A value built on first use.
+
+    Concurrent first callers share a single build: the factory runs once
+    under a per-resource lock and everyone else waits for its result. A
+    failed build is not cached, so the next caller retries.
+    """
+    def __init__(self, name, factory):
+        """
+        Initialize the resource.
+
+        Args:
+            name (str): Name used in log messages.
+            factory (callable): Builds the value; called with no arguments.
+        """
+        self.name = name
+        self.factory = factory
+        self.build_seconds = None
+        self._value = None
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self):
+        """
+        Whether the value has been built.
+        """
+        return self._ready
+
+    def get(self):
+        """
+        Return the value, building it first if needed.
+
+        Returns:
+            object: The factory's result.
+        """
+        if self._ready:
+            return self._value
+        with self._lock:
+            if not self._ready:
+                start = time.perf_counter()
+                self._value = self.factory()
+                self.build_seconds = time.perf_counter() - start
+                self._ready = True
+                print(f"Initialised {self.name} in {self.build_seconds:.2f}s")
+        return self._value
+
+    def rebuild(self):
+        """
+        Build a fresh value and swap it in, if the value was ever built.
+
+        Callers keep getting the previous value until the new one is ready.
+        A build in progress is waited for, then rebuilt.
+
+        Returns:
+            bool: Whether a rebuild happened.
+        """
+        with self._lock:
+            if not self._ready:
+                return False
+            start = time.perf_counter()
+            self._value = self.factory()
+            self.build_seconds = time.perf_counter() - start
+            print(f"Rebuilt {self.name} in {self.build_seconds:.2f}s")
+        return True
+
+    async def aget(self):
+        """
+        Async variant of get() that builds the value off the event loop.
+        """
+        if self._ready:
+            return self._value
+        return await asyncio.get_running_loop().run_in_executor(None, self.get)
+
+
+def warm_up(resources):
+    """
+    Build resources one after another on a background daemon thread.
+
+    Failures are logged and left for the first real request to retry.
+
+    Args:
+        resources (list[LazyResource]): Resources to build, in priority order.
+
+    Returns:
+        threading.Thread: The started warm-up thread.
+    """
+    def run():
+        start = time.perf_counter()
+        for resource in resources:
+            try:
+                resource.get()
+            except Exception as e:
+                print(f"Warm-up of {resource.name} failed: {e}")
+        print(f"Warm-up finished in {time.perf_counter() - start:.2f}s")
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,103 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+
+# Common question words that carry no lexical signal
+STOPWORDS = frozenset(
+    "a all an and any are about at be by can did do does for from get give got had has have "
+    "he her him his how i in is it list many me much of on or she show tell that the their "
+    "there this to was were what when where which who whom why with you your".split()
+)
+
+
+def tokenize(text):
+    """
+    Lower-case alphanumeric tokens, so course codes like "CS60050" survive intact.
+    """
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+class BM25Index:
+    """
+    In-memory inverted index scored with Okapi BM25.
+    """
+    def __init__(self, documents, k1=1.5, b=0.75):
+        """
+        Build the index.
+
+        Args:
+            documents (list[str]): Texts to index; results refer to their positions.
+            k1 (float, optional): Term-frequency saturation.
+            b (float, optional): Length normalisation strength.
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+        for position, text in enumerate(documents):
+            counts = Counter(tokenize(text))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((position, tf))
+
+        count = len(self.doc_lengths)
+        self.avg_length = sum(self.doc_lengths) / count if count else 0.0
+        self.idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query, k=5, allowed=None):
+        """
+        Rank documents for a query.
+
+        Args:
+            query (str): Search text.
+            k (int, optional): Maximum number of results.
+            allowed (set, optional): Restrict results to these positions.
+
+        Returns:
+            list[tuple]: (position, score, normalised score) sorted by score.
+                The normalised score divides by the score of a document of
+                average length containing every query term once, capped at 1.
+                Query terms missing from the corpus count against it.
+        """
+        terms = set(tokenize(query)) - STOPWORDS
+        scores = defaultdict(float)
+        for term in terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, tf in self.postings[term]:
+                if allowed is not None and position not in allowed:
+                    continue
+                length_norm = 1 - self.b + self.b * self.doc_lengths[position] / (self.avg_length or 1)
+                scores[position] += idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+
+        count = len(self.doc_lengths)
+        unseen_idf = math.log(1 + (count + 0.5) / 0.5)
+        reference = sum(self.idf.get(term, unseen_idf) for term in terms)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [
+            (position, score, min(1.0, score / reference) if reference else 0.0)
+            for position, score in ranked
+        ]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse several rankings of the same items.
+
+    Args:
+        rankings (list[list]): Each ranking lists item keys, best first.
+        k (int, optional): Damping constant.
+
+    Returns:
+        list: Item keys ordered by fused score.
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,407 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import random
+import threading
+import time
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from tracing import tracer
+
+# Error type names and message fragments of transient upstream failures
+RETRYABLE_ERRORS = (
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+    "InternalServerError", "Timeout", "TimeoutError", "ConnectionError",
+)
+RETRYABLE_MESSAGES = ("429", "503", "rate limit", "quota", "resource exhausted", "temporarily unavailable")
+# Governor counters exported as gauges, by metric name
+GAUGES = {"queued": "llm_queue_depth", "active": "llm_active_calls"}
+
+
+def is_retryable(error):
+    """
+    Whether an error from the model API is worth retrying.
+
+    Args:
+        error (Exception): Raised error.
+
+    Returns:
+        bool: True for rate limiting, overload, timeouts and connection errors.
+    """
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status in (429, 500, 502, 503, 504):
+        return True
+    if any(name in type(error).__name__ for name in RETRYABLE_ERRORS):
+        return True
+    message = str(error).lower()
+    return any(fragment in message for fragment in RETRYABLE_MESSAGES)
+
+
+class LLMGovernor:
+    """
+    Shared limits for every call to the chat model.
+
+    Calls wait for a token from a token bucket (the request rate limit) and
+    for one of max_concurrency slots, and transient errors are retried with
+    exponential backoff and full jitter. Identical prompts that are already
+    in flight are answered by the running call instead of a new one.
+    """
+    def __init__(self, rate=5.0, burst=10, max_concurrency=8, max_retries=4,
+                 base_delay=0.5, max_delay=8.0, retryable=is_retryable):
+        """
+        Initialize the governor.
+
+        Args:
+            rate (float, optional): Sustained requests per second; 0 disables rate limiting.
+            burst (int, optional): Requests that may be sent at once after an idle period.
+            max_concurrency (int, optional): Maximum requests in flight.
+            max_retries (int, optional): Retries of a failed request.
+            base_delay (float, optional): Backoff before the first retry, in seconds.
+            max_delay (float, optional): Upper bound of a single backoff.
+            retryable (callable, optional): Decides whether an error is retried.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable = retryable
+        self._tokens = float(burst)
+        self._refilled = time.monotonic()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            "calls": 0,
+            "queued": 0,
+            "max_queued": 0,
+            "active": 0,
+            "throttled": 0,
+            "throttled_seconds": 0.0,
+            "retries": 0,
+            "errors": 0,
+            "coalesced": 0,
+        }
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+            if name == "queued":
+                self.counters["max_queued"] = max(self.counters["max_queued"], self.counters["queued"])
+            # Set under the lock so concurrent updates cannot publish out of order
+            if name in GAUGES:
+                tracer.metrics.set(GAUGES[name], self.counters[name])
+        if name in ("throttled", "retries", "errors", "coalesced"):
+            tracer.metrics.inc(f"llm_{name}", value)
+
+    def _reserve_token(self):
+        """
+        Take a token from the bucket.
+
+        Returns:
+            float: Seconds to wait before sending; 0 when a token was available.
+        """
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+            self._refilled = now
+            # The token is taken even when the bucket is empty; callers wait for it to refill
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            self._count("throttled")
+            self._count("throttled_seconds", wait)
+        return wait
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _acquire(self):
+        self._count("queued")
+        try:
+            time.sleep(self._reserve_token())
+            self._slots.acquire()
+        finally:
+            self._count("queued", -1)
+        self._count("active")
+
+    async def _aacquire(self):
+        self._count("queued")
+        try:
+            await asyncio.sleep(self._reserve_token())
+            # Slots are shared with synchronous callers, so poll instead of blocking the loop
+            delay = 0.005
+            while not self._slots.acquire(blocking=False):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 0.1)
+        finally:
+            self._count("queued", -1)
+        self._count("active")
+
+    def _release(self):
+        self._slots.release()
+        self._count("active", -1)
+
+    def _should_retry(self, error, attempt):
+        if attempt < self.max_retries and self.retryable(error):
+            self._count("retries")
+            return True
+        self._count("errors")
+        return False
+
+    def call(self, fn):
+        """
+        Run a model request under the limits, retrying transient errors.
+
+        Args:
+            fn (callable): Sends the request and returns its result.
+
+        Returns:
+            object: fn's result.
+        """
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            try:
+                return fn()
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+            finally:
+                self._release()
+            time.sleep(self._backoff(attempt))
+
+    async def acall(self, fn):
+        """
+        Async variant of call(); fn returns an awaitable.
+        """
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            await self._aacquire()
+            try:
+                return await fn()
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+            finally:
+                self._release()
+            await asyncio.sleep(self._backoff(attempt))
+
+    def stream(self, start):
+        """
+        Run a streaming request under the limits.
+
+        The concurrency slot is held until the last chunk has been consumed
+        (or the stream is closed); transient errors are retried only until
+        the first chunk arrives, since chunks already yielded cannot be taken back.
+
+        Args:
+            start (callable): Opens the stream and returns an iterator of chunks.
+
+        Yields:
+            object: The stream's chunks.
+        """
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            try:
+                chunks = start()
+                first = next(chunks, None)
+                break
+            except BaseException as e:
+                self._release()
+                if not isinstance(e, Exception) or not self._should_retry(e, attempt):
+                    raise
+            time.sleep(self._backoff(attempt))
+        try:
+            if first is None:
+                return
+            yield first
+            yield from chunks
+        finally:
+            self._release()
+
+    async def astream(self, start):
+        """
+        Async variant of stream(); start returns an async iterator.
+        """
+        self._count("calls")
+        for attempt in range(self.max_retries + 1):
+            await self._aacquire()
+            try:
+                chunks = start()
+                try:
+                    first = await chunks.__anext__()
+                except StopAsyncIteration:
+                    first = None
+                break
+            except BaseException as e:
+                self._release()
+                if not isinstance(e, Exception) or not self._should_retry(e, attempt):
+                    raise
+            await asyncio.sleep(self._backoff(attempt))
+        try:
+            if first is None:
+                return
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            self._release()
+
+    def _join(self, key):
+        """
+        Join an identical in-flight request or register a new one.
+
+        Returns:
+            tuple: (future, whether the caller must run the request)
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                future.followers += 1
+                self.counters["coalesced"] += 1
+                tracer.metrics.inc("llm_coalesced")
+                return future, False
+            future = concurrent.futures.Future()
+            future.followers = 0
+            self._in_flight[key] = future
+            return future, True
+
+    def _settle(self, key, future, result=None, error=None):
+        with self._lock:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _settle_task(self, key, future, task):
+        if task.cancelled():
+            with self._lock:
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+            future.cancel()
+        elif task.exception() is not None:
+            self._settle(key, future, error=task.exception())
+        else:
+            self._settle(key, future, task.result())
+
+    def single_flight(self, key, fn):
+        """
+        Run call(fn) unless an identical request is in flight, then share its result.
+
+        Args:
+            key (str): Identity of the request.
+            fn (callable): Sends the request.
+
+        Returns:
+            object: The request's result.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = self.call(fn)
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    async def asingle_flight(self, key, fn):
+        """
+        Async variant of single_flight().
+        """
+        future, leader = self._join(key)
+        if not leader:
+            # Shielded, so a cancelled follower does not cancel the shared call
+            return await asyncio.shield(asyncio.wrap_future(future))
+        # The request runs in its own task, so cancelling the leader (e.g. a
+        # speculative routing task) does not fail the followers waiting on it
+        task = asyncio.ensure_future(self.acall(fn))
+        task.add_done_callback(lambda done: self._settle_task(key, future, done))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            with self._lock:
+                unshared = future.followers == 0 and self._in_flight.get(key) is future
+                if unshared:
+                    del self._in_flight[key]
+            if unshared:
+                task.cancel()
+            raise
+
+    def stats(self):
+        """
+        Governor counters.
+
+        Returns:
+            dict: calls, current and peak queue depth, active requests,
+                throttling, retries, errors and coalesced requests.
+        """
+        with self._lock:
+            return dict(self.counters)
+
+
+class GovernedChatModel(BaseChatModel):
+    """
+    Chat model wrapper that sends every request through an LLMGovernor.
+
+    Complete generations of identical prompts are coalesced while one is in
+    flight. Streams hold a concurrency slot until their last chunk, are
+    retried only until their first chunk arrives, and are never coalesced.
+    """
+    model: Any
+    governor: Any
+
+    @property
+    def _llm_type(self):
+        return f"governed-{self.model._llm_type}"
+
+    @property
+    def _identifying_params(self):
+        return self.model._identifying_params
+
+    @staticmethod
+    def _key(messages, stop, kwargs):
+        payload = json.dumps(
+            {
+                "messages": [(message.type, message.content) for message in messages],
+                "stop": stop,
+                "kwargs": kwargs,
+            },
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self.governor.single_flight(
+            self._key(messages, stop, kwargs),
+            lambda: self.model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        )
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return await self.governor.asingle_flight(
+            self._key(messages, stop, kwargs),
+            lambda: self.model._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        )
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        yield from self.governor.stream(
+            lambda: self.model._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+        )
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async for chunk in self.governor.astream(
+            lambda: self.model._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+        ):
+            yield chunk
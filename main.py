@@ -1,191 +1,862 @@
+import asyncio
+import contextvars
+import hashlib
 import os
-import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import gradio as gr
 from dotenv import load_dotenv
 
-from document_loader import DocumentLoader
+from data_loader import DocumentLoader
+from text_cache import TextCache
 from vector_store import VectorStoreManager
+from embeddings import HashingEmbeddings
+from intent_router import IntentRouter
+from response_cache import ResponseCache
 from agents import AgentManager
-from chat_handler import ChatHandler
+from chat_handler import ChatHandler, SQLiteSessionBackend
+from history_manager import HistoryManager
+from context_packer import ContextPacker
+from doc_watcher import DocumentWatcher
+from flow import arun_flow, run_flow
+from lazy import LazyResource, warm_up
+from source_registry import SourceRegistry, CV_ROUTE, NONE_ROUTE, OFF_TOPIC_ROUTE
+from tracing import tracer, TokenUsageHandler, start_metrics_server
+from llm_governor import LLMGovernor
 
 class ProfileQuerySystem:
     """
     Main application class for Sarwesh's Profile Query System.
     """
-    def __init__(self):
+    ROUTING_MODES = ("sequential", "single", "speculative")
+
+    def __init__(self, routing_mode=None, speculate_answer=None, sources_config=None, llm=None, embeddings=None):
         """
         Initialize the Profile Query System.
+        
+        Only the CV is loaded up front. Each additional source is loaded,
+        indexed and given its agent on first use, or earlier by warm_up().
+        
+        Args:
+            routing_mode (str, optional): How queries are routed:
+                "sequential" runs the answerability and data identifier agents one after
+                the other, "single" asks one combined router agent, and "speculative"
+                runs both routing agents concurrently. Defaults to $ROUTING_MODE or "sequential".
+            speculate_answer (bool, optional): In speculative mode, also start the
+                main agent before the route is known. Defaults to $SPECULATE_ANSWER.
+            sources_config (str, optional): JSON file declaring the CV and data
+                sources. Defaults to $SOURCES_CONFIG or "sources.json".
+            llm (BaseChatModel, optional): Chat model used by every agent instead of Gemini.
+            embeddings (Embeddings, optional): Embedding backend used instead of the
+                Google model or $EMBEDDING_BACKEND.
         """
+        started = time.perf_counter()
         # Load environment variables
         load_dotenv()
-        os.environ["GOOGLE_API_KEY"] = os.getenv('GEMINI_API_KEY')
+        if os.getenv('GEMINI_API_KEY'):
+            os.environ["GOOGLE_API_KEY"] = os.getenv('GEMINI_API_KEY')
+
+        self.routing_mode = routing_mode or os.getenv("ROUTING_MODE", "sequential")
+        if self.routing_mode not in self.ROUTING_MODES:
+            raise ValueError(f"Unknown routing mode '{self.routing_mode}'. Expected one of {self.ROUTING_MODES}.")
+        if speculate_answer is None:
+            speculate_answer = os.getenv("SPECULATE_ANSWER", "false").lower() in ("1", "true", "yes")
+        self.speculate_answer = speculate_answer
+        self.executor = ThreadPoolExecutor(max_workers=8)
+        self.max_concurrent_requests = int(os.getenv("MAX_CONCURRENT_REQUESTS", "32"))
+        self._request_semaphore = None
+        self.registry = SourceRegistry.load(sources_config or os.getenv("SOURCES_CONFIG", "sources.json"))
+
+        # Per-stage spans feed the metrics endpoint and the optional trace file
+        trace_file = os.getenv("TRACE_FILE")
+        metrics_port = os.getenv("METRICS_PORT")
+        callbacks = None
+        if os.getenv("TRACING", "false").lower() in ("1", "true", "yes") or trace_file or metrics_port:
+            tracer.configure(enabled=True, trace_path=trace_file)
+            callbacks = [TokenUsageHandler()]
+            if metrics_port:
+                self.metrics_server = start_metrics_server(int(metrics_port))
 
         # Initialize components
-        self.document_loader = DocumentLoader()
-        self.vector_store_manager = VectorStoreManager()
-        self.agent_manager = AgentManager()
-        self.chat_handler = ChatHandler()
-
-        # Load documents
-        self.cv_text = self.document_loader.read_pdf("Profile_Query_System/Profile_chatbot/data/CV_Sarwesh_ (1).pdf")
-        self.transcript_text = self.document_loader.read_pdf("Profile_Query_System/Profile_chatbot/data/sarwesh_transcript.pdf")
-        self.publication_text = self.document_loader.read_pdf("Profile_Query_System/Profile_chatbot/data/causality between sentiment and crypto currency prices.pdf")
-        self.mitacs_text = self.document_loader.read_pdf("Profile_Query_System/Profile_chatbot/data/MITACS_RESEARCH.pdf")
-        self.snowflake_text = self.document_loader.read_docx("Profile_Query_System/Profile_chatbot/data/Query Intent.docx")+"\n\n"
-        self.snowflake_text +=self.document_loader.read_docx("Profile_Query_System/Profile_chatbot/data/Document Diversity.docx")
-        
-
-        # Create vector stores
-        self.publication_vector_store = self.vector_store_manager.create_vector_store(
-            self.publication_text
+        self.document_loader = DocumentLoader(
+            text_cache=TextCache(os.getenv("TEXT_CACHE_DIR", ".text_cache"))
         )
-        self.snowflake_vector_store = self.vector_store_manager.create_vector_store(
-            self.snowflake_text
+        # EMBEDDING_BACKEND=hashing runs ingestion and retrieval fully offline
+        if embeddings is None and os.getenv("EMBEDDING_BACKEND") == "hashing":
+            embeddings = HashingEmbeddings()
+        self.vector_store_manager = VectorStoreManager(
+            cache_dir=os.getenv("INDEX_CACHE_DIR", ".index_cache"),
+            embeddings=embeddings,
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "32")),
+            max_workers=int(os.getenv("EMBEDDING_WORKERS", "4")),
+            retrieval_mode=os.getenv("RETRIEVAL_MODE", "lexical_first"),
+            lexical_threshold=float(os.getenv("LEXICAL_THRESHOLD", "0.6")),
+            query_cache_size=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+            chunk_tokens=int(os.getenv("CHUNK_TOKENS", "300")),
+            chunk_overlap_tokens=int(os.getenv("CHUNK_OVERLAP_TOKENS", "0")),
+            index_type=os.getenv("INDEX_TYPE", "flat"),
+            # 0 scales the lists probed with the size of the index
+            ivf_nprobe=int(os.getenv("IVF_NPROBE", "0")) or None,
+            mmap=os.getenv("INDEX_MMAP", "false").lower() in ("1", "true", "yes")
         )
+        # Every agent chain shares one rate limit, concurrency limit and retry policy
+        governor = None
+        if os.getenv("LLM_GOVERNOR", "true").lower() in ("1", "true", "yes"):
+            governor = LLMGovernor(
+                rate=float(os.getenv("LLM_RATE_LIMIT", "5")),
+                burst=int(os.getenv("LLM_BURST", "10")),
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+                max_retries=int(os.getenv("LLM_MAX_RETRIES", "4")),
+                base_delay=float(os.getenv("LLM_RETRY_DELAY", "0.5"))
+            )
+        self.agent_manager = AgentManager(llm=llm, callbacks=callbacks, governor=governor)
+        session_limits = {
+            "max_sessions": int(os.getenv("MAX_SESSIONS", "1000")),
+            "idle_ttl": float(os.getenv("SESSION_IDLE_TTL", "3600")),
+            "max_messages": int(os.getenv("MAX_SESSION_MESSAGES", "50")),
+        }
+        session_backend = None
+        if os.getenv("SESSION_BACKEND") == "sqlite":
+            session_backend = SQLiteSessionBackend(os.getenv("SESSION_DB", "sessions.db"), **session_limits)
+        self.chat_handler = ChatHandler(backend=session_backend, **session_limits)
+        self.intent_router = None
+        if os.getenv("LOCAL_INTENT_ROUTER", "true").lower() in ("1", "true", "yes"):
+            self.intent_router = IntentRouter(
+                self.vector_store_manager.embeddings,
+                self.registry.route_examples(),
+                threshold=float(os.getenv("INTENT_ROUTER_THRESHOLD", "0.75")),
+                margin=float(os.getenv("INTENT_ROUTER_MARGIN", "0.05")),
+                cache=self.vector_store_manager.index_cache,
+                model=self.vector_store_manager.model
+            )
+
+        # Only the CV is needed to start answering; other sources load on demand
+        document_paths = self.registry.document_paths()
+        self.cv_text = self.document_loader.load_documents({CV_ROUTE: document_paths[CV_ROUTE]})[CV_ROUTE]
+        self.documents = {CV_ROUTE: self.cv_text}
+
+        # Cache of first-turn answers, tied to the current document contents
+        self.response_cache = None
+        if os.getenv("RESPONSE_CACHE", "true").lower() in ("1", "true", "yes"):
+            self.response_cache = ResponseCache(
+                self.vector_store_manager.embeddings,
+                max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "256")),
+                ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+                similarity_threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92")),
+                version=self.files_version(document_paths)
+            )
+
+        # One index over every loaded document; queries are filtered to the routed source
+        self.context_packer = ContextPacker(
+            self.vector_store_manager,
+            token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+        )
+        self.context_packer.add_sources(self.documents, self.registry.chunking())
 
         # Initialize agents
         self.answerability_agent = self.agent_manager.create_answerability_agent()
-        self.data_identifier_agent = self.agent_manager.create_data_identifier_agent()
+        self.router_agent = self.agent_manager.create_router_agent(self.registry)
+        self.data_identifier_agent = self.agent_manager.create_data_identifier_agent(self.registry)
         self.main_agent = self.agent_manager.create_main_agent()
-        self.transcript_agent = self.agent_manager.create_transcript_agent()
-        self.publication_agent = self.agent_manager.create_publication_agent()
-        self.mitacs_agent = self.agent_manager.create_mitacs_agent()
-        self.snowflake_agent = self.agent_manager.create_snowflake_agent()
+        self.history_manager = HistoryManager(
+            summarizer=self.agent_manager.create_summary_agent(),
+            keep_last_turns=int(os.getenv("HISTORY_KEEP_TURNS", "3")),
+            max_sessions=session_limits["max_sessions"],
+            idle_ttl=session_limits["idle_ttl"]
+        )
+        self.routing_history_tokens = int(os.getenv("ROUTING_HISTORY_TOKENS", "300"))
+        self.main_history_tokens = int(os.getenv("MAIN_HISTORY_TOKENS", "800"))
+        self.source_resources = {
+            source.name: LazyResource(f"{source.name} source", partial(self._load_source, source))
+            for source in self.registry.sources
+        }
+        self._reload_lock = threading.Lock()
+        self.document_watcher = None
+        if os.getenv("WATCH_DOCUMENTS", "true").lower() in ("1", "true", "yes"):
+            self.document_watcher = DocumentWatcher(
+                self.registry.document_paths,
+                self.reload_documents,
+                interval=float(os.getenv("WATCH_INTERVAL", "5"))
+            )
+            self.document_watcher.start()
+        print(f"Ready in {time.perf_counter() - started:.2f}s")
 
-    def route_query(self, input_dict, session_id):
+    @staticmethod
+    def files_version(paths):
         """
-        Route the query to the appropriate agent based on context and data source.
+        Fingerprint the source files without reading them.
         
         Args:
-            input_dict (dict): Input dictionary containing query and context
-            session_id (str): Current session identifier
+            paths (dict): Maps document names to lists of file paths.
         
         Returns:
-            str: Response from the appropriate agent
+            str: Hex digest that changes whenever any file's size or modification time changes.
         """
-        # Get chat history for the session
-        chat_history = self.chat_handler.get_session_history(session_id)
+        digest = hashlib.sha256()
+        for name in sorted(paths):
+            for path in paths[name]:
+                stat = os.stat(path)
+                digest.update(f"{name}\0{path}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode("utf-8"))
+        return digest.hexdigest()
+
+    def _load_source(self, source):
+        """
+        Load and index a source's documents and build its agent.
         
-        # Prepare input for answerability check
-        agent_input = {
-            "input": input_dict["input"],
-            "cv": self.cv_text,
-            "chat_history": chat_history.messages
+        Args:
+            source (Source): Registered source.
+        
+        Returns:
+            Runnable: The source's answer agent.
+        """
+        paths = self.registry.document_paths()[source.name]
+        text = self.document_loader.load_documents({source.name: paths})[source.name]
+        self.context_packer.add_sources({source.name: text}, {source.name: source.chunking})
+        self.documents[source.name] = text
+        return self.agent_manager.create_source_agent(source)
+
+    def reload_documents(self, names):
+        """
+        Re-read changed documents and swap them in while requests keep being served.
+        
+        Only new or edited chunks are embedded; the shared index and the
+        document texts are replaced once the new versions are ready.
+        Sources that were never loaded are skipped, since their first use
+        reads the current files anyway. Cached answers are dropped.
+        
+        Args:
+            names (set): Names of the changed documents ("cv" or source names).
+        """
+        with self._reload_lock:
+            started = time.perf_counter()
+            if CV_ROUTE in names:
+                paths = self.registry.document_paths()[CV_ROUTE]
+                cv_text = self.document_loader.load_documents({CV_ROUTE: paths})[CV_ROUTE]
+                self.context_packer.add_sources({CV_ROUTE: cv_text}, self.registry.chunking())
+                self.documents[CV_ROUTE] = cv_text
+                self.cv_text = cv_text
+            for name in names:
+                resource = self.source_resources.get(name)
+                if resource is not None:
+                    resource.rebuild()
+            if self.response_cache is not None:
+                self.response_cache.invalidate(version=self.files_version(self.registry.document_paths()))
+            print(f"Reloaded {', '.join(sorted(names))} in {time.perf_counter() - started:.2f}s")
+
+    def warm_up(self):
+        """
+        Build the intent router and every source on a background thread.
+        
+        Returns:
+            threading.Thread: The started warm-up thread.
+        """
+        resources = []
+        if self.intent_router:
+            resources.append(LazyResource("intent router", self.intent_router.ensure_fitted))
+        resources.extend(self.source_resources.values())
+        return warm_up(resources)
+
+    def _steps(self):
+        """
+        Synchronous implementations of the steps yielded by request flows (see flow.py).
+        """
+        return {
+            "lookup": lambda query: self.response_cache.lookup(query),
+            "window": self.history_manager.window,
+            "pack": self.context_packer.pack,
+            "route": self._route,
+            "retrieve": self._retrieve_context,
+            "intent_router": lambda query: self.intent_router.route(query),
+            "data_identifier": self.data_identifier_agent.invoke,
         }
+
+    def _asteps(self):
+        """
+        Async implementations of the steps yielded by request flows.
+        """
+        return {
+            "lookup": lambda query: self.response_cache.alookup(query),
+            "window": self.history_manager.awindow,
+            "pack": self.context_packer.apack,
+            "route": self._aroute,
+            "retrieve": self._aretrieve_context,
+            "intent_router": lambda query: self.intent_router.aroute(query),
+            "data_identifier": self.data_identifier_agent.ainvoke,
+        }
+
+    def _identify_flow(self, agent_input):
+        """
+        Flow identifying which additional source is needed.
+        
+        The local intent router answers confident cases without a model
+        call; ambiguous queries fall back to the data identifier agent.
         
+        Args:
+            agent_input (dict): Query and packed CV context.
         
-        # Check if the question can be answered using the CV
-        answerability_response = self.answerability_agent.invoke(agent_input)
+        Returns:
+            str or None: Route label of a source, "none" or "off_topic", or None
+                if the agent's answer could not be parsed.
+        """
+        query = agent_input["input"]
+        decision = None
+        if self.intent_router:
+            with tracer.span("intent_router") as span:
+                decision = yield "intent_router", (query,)
+                span.set("route", str(decision["route"]))
+            if decision["route"] is not None:
+                return decision["route"]
         
+        data_identifier_input = {
+            "input": query,
+            "cv": agent_input["cv"]
+        }
+        with tracer.span("data_identifier") as span:
+            data_identifier_response = yield "data_identifier", (data_identifier_input,)
+            
+            # Map the number in the response back to a route label
+            route = self.registry.parse_route(data_identifier_response)
+            span.set("route", str(route))
+        if decision is not None:
+            # Record the agent's answer next to the local scores for threshold tuning
+            decision["llm_route"] = route
+        return route
+
+    def _identify_data_source(self, agent_input):
+        """
+        Identify which additional source is needed; see _identify_flow.
+        """
+        return run_flow(self._identify_flow(agent_input), self._steps())
+
+    def _route_sequential(self, agent_input):
+        """
+        Answerability check followed, if needed, by the data identifier.
+        
+        Returns:
+            tuple: (route label or None, precomputed response or None)
+        """
+        with tracer.span("answerability"):
+            answerability_response = self.answerability_agent.invoke(agent_input)
         if answerability_response.strip().lower() == "yes":
+            return CV_ROUTE, None
+        return self._identify_data_source(agent_input), None
+
+    def _route_single(self, agent_input):
+        """
+        Decide answerability and data source with one combined call.
+        
+        Returns:
+            tuple: (route label or None, precomputed response or None)
+        """
+        with tracer.span("router"):
+            router_response = self.router_agent.invoke(agent_input)
+        return self.registry.parse_route(router_response, include_cv=True), None
+
+    def _route_speculative(self, agent_input):
+        """
+        Run both routing calls, and optionally the main agent, concurrently.
+        
+        The answerability result decides which of the speculative calls is
+        used; the losers are cancelled if they have not started yet and
+        their results are otherwise discarded.
+        
+        Returns:
+            tuple: (route label or None, precomputed response or None)
+        """
+        answerability_future = self._submit(self._answerable, agent_input)
+        identifier_future = self._submit(self._identify_data_source, agent_input)
+        main_future = None
+        if self.speculate_answer:
+            main_future = self._submit(self._speculative_answer, self._main_input(agent_input))
+        
+        if answerability_future.result():
+            identifier_future.cancel()
+            return CV_ROUTE, main_future.result() if main_future else None
+        
+        if main_future:
+            main_future.cancel()
+        return identifier_future.result(), None
+
+    def _submit(self, fn, *args):
+        """
+        Run a call on the executor in a copy of the current context, so its spans
+        nest under the caller's.
+        """
+        return self.executor.submit(contextvars.copy_context().run, fn, *args)
+
+    def _answerable(self, agent_input):
+        with tracer.span("answerability"):
+            return self.answerability_agent.invoke(agent_input).strip().lower() == "yes"
+
+    def _speculative_answer(self, main_input):
+        with tracer.span("speculative_answer"):
+            return self.main_agent.invoke(main_input)
+
+    async def _aanswerable(self, agent_input):
+        with tracer.span("answerability"):
+            return (await self.answerability_agent.ainvoke(agent_input)).strip().lower() == "yes"
+
+    async def _aspeculative_answer(self, main_input):
+        with tracer.span("speculative_answer"):
+            return await self.main_agent.ainvoke(main_input)
+
+    async def _aidentify_data_source(self, agent_input):
+        """
+        Async variant of _identify_data_source.
+        """
+        return await arun_flow(self._identify_flow(agent_input), self._asteps())
+
+    async def _aroute(self, agent_input):
+        """
+        Async variant of _route. In speculative mode the losing calls are cancelled.
+        
+        Returns:
+            tuple: (route label or None, precomputed response or None)
+        """
+        if self.routing_mode == "single":
+            with tracer.span("router"):
+                router_response = await self.router_agent.ainvoke(agent_input)
+            return self.registry.parse_route(router_response, include_cv=True), None
+        
+        if self.routing_mode == "sequential":
+            if await self._aanswerable(agent_input):
+                return CV_ROUTE, None
+            return await self._aidentify_data_source(agent_input), None
+        
+        identifier_task = asyncio.ensure_future(self._aidentify_data_source(agent_input))
+        main_task = None
+        if self.speculate_answer:
+            main_task = asyncio.ensure_future(self._aspeculative_answer(self._main_input(agent_input)))
+        try:
+            answerable = await self._aanswerable(agent_input)
+        except BaseException:
+            identifier_task.cancel()
+            if main_task:
+                main_task.cancel()
+            raise
+        
+        if answerable:
+            identifier_task.cancel()
+            return CV_ROUTE, await main_task if main_task else None
+        
+        if main_task:
+            main_task.cancel()
+        return await identifier_task, None
+
+    def _retrieve_context(self, route, query):
+        """
+        Retrieve the query-specific context a route's agent needs.
+        
+        Args:
+            route (str or None): Route label.
+            query (str): User's question.
+        
+        Returns:
+            str or None: Packed or retrieved context, or None if the route needs none.
+        """
+        source = self.registry.get(route)
+        if source is None:
+            return None
+        with tracer.span("retrieval", source=source.name):
+            self.source_resources[source.name].get()
+            if source.chunking == "sections":
+                return self.context_packer.pack(query, source.name)
+            return self.context_packer.retrieve(query, source.name, top_k=source.top_k)
+
+    async def _aretrieve_context(self, route, query):
+        """
+        Async variant of _retrieve_context.
+        """
+        source = self.registry.get(route)
+        if source is None:
+            return None
+        with tracer.span("retrieval", source=source.name):
+            await self.source_resources[source.name].aget()
+            if source.chunking == "sections":
+                return await self.context_packer.apack(query, source.name)
+            return await self.context_packer.aretrieve(query, source.name, top_k=source.top_k)
+
+    @staticmethod
+    def _main_input(agent_input):
+        """
+        Input for the main agent, which gets a larger share of the chat history than the routing agents.
+        """
+        return {
+            "input": agent_input["input"],
+            "cv": agent_input["cv"],
+            "chat_history": agent_input["main_chat_history"]
+        }
+
+    def _select_agent(self, route, agent_input, context=None):
+        """
+        Select the agent for a route and build its input.
+        
+        Args:
+            route (str or None): "cv", a source name, "none" or "off_topic".
+            agent_input (dict): Query, CV and chat history windows.
+            context (str, optional): Already retrieved context; looked up when not given.
+        
+        Returns:
+            tuple: (agent, agent input, None), or (None, None, fixed response)
+                for routes that need no model call.
+        """
+        query = agent_input["input"]
+        
+        if route is None:
+            return None, None, "Unable to determine the appropriate data source."
+        
+        if route == CV_ROUTE:
             # Use main agent to answer from CV
-            response = self.main_agent.invoke(input_dict)
-        else:
-            # Identify which additional data source is needed
-            data_identifier_input = {
-                "input": input_dict["input"],
-                "cv": self.cv_text
-            }
-            data_identifier_response = self.data_identifier_agent.invoke(data_identifier_input)
-            
-            # Extract the number from the response
-            match = re.search(r'\b[1-6]\b', data_identifier_response)
-            
-            if match:
-                number = int(match.group())
-                
-                # Route to appropriate agent based on the number
-                if number == 1:
-                    # Transcript agent
-                    transcript_input = {
-                        "input": input_dict["input"],
-                        "transcript": self.transcript_text
-                    }
-                    response = self.transcript_agent.invoke(transcript_input)
-                
-                elif number == 2:
-                    # Publication agent
-                    publication_context = self.vector_store_manager.retrieve_relevant_chunks(
-                        input_dict["input"], 
-                        self.publication_vector_store
-                    )
-                    publication_input = {
-                        "input": input_dict["input"],
-                        "publication_context": publication_context
-                    }
-                    response = self.publication_agent.invoke(publication_input)
-                
-                elif number == 3:
-                    # Snowflake agent
-                    snowflake_context = self.vector_store_manager.retrieve_relevant_chunks(
-                        input_dict["input"], 
-                        self.snowflake_vector_store
-                    )
-                    snowflake_input = {
-                        "input": input_dict["input"],
-                        "snowflake_context": snowflake_context
-                    }
-                    response = self.snowflake_agent.invoke(snowflake_input)
-                
-                elif number == 4:
-                    # Mitacs agent
-                    mitacs_input = {
-                        "input": input_dict["input"],
-                        "mitacs_text": self.mitacs_text
-                    }
-                    response = self.mitacs_agent.invoke(mitacs_input)
-                
-                elif number == 5:
-                    response = "I don't have the relevant information for the query."
-                
-                elif number == 6:
-                    response = "Please ask questions related to Sarwesh."
-                
+            return self.main_agent, self._main_input(agent_input), None
+        
+        if route == NONE_ROUTE:
+            return None, None, "I don't have the relevant information for the query."
+        
+        if route == OFF_TOPIC_ROUTE:
+            return None, None, f"Please ask questions related to {self.registry.profile_name}."
+        
+        source = self.registry.get(route)
+        if source is None:
+            return None, None, "Error in routing the query."
+        
+        # Loads the source on first use
+        agent = self.source_resources[route].get()
+        if context is None:
+            context = self._retrieve_context(route, query)
+        source_input = {
+            "input": query,
+            "context": context
+        }
+        if source.include_cv:
+            source_input["cv"] = agent_input["cv"]
+        return agent, source_input, None
+
+    def _route(self, agent_input):
+        """
+        Decide between the CV and the additional data sources using the configured routing mode.
+        
+        Returns:
+            tuple: (route label or None, precomputed response or None)
+        """
+        if self.routing_mode == "single":
+            return self._route_single(agent_input)
+        elif self.routing_mode == "speculative":
+            return self._route_speculative(agent_input)
+        return self._route_sequential(agent_input)
+
+    def _prepare_flow(self, input_dict, session_id, request_span, info):
+        """
+        Everything before generation: cache lookup, history windows, CV
+        packing, routing, retrieval and agent selection.
+        
+        Returns:
+            dict: The request, with "agent" and "chain_input" to stream, or
+                "agent" None and the final "response" (a cached answer or a
+                fixed or precomputed response).
+        """
+        query = input_dict["input"]
+        chat_history = self.chat_handler.get_session_history(session_id)
+        messages = chat_history.messages
+        request = {
+            "input": query,
+            "chat_history": chat_history,
+            # Answers are only shared across conversations when they cannot depend on chat history
+            "cacheable": self.response_cache is not None and not messages,
+            "query_vector": None,
+            "cache_generation": None,
+            "route": None,
+            "agent": None,
+            "chain_input": None,
+            "response": None,
+        }
+        if request["cacheable"]:
+            # Taken before anything is read, so an answer overlapping a reload is not stored
+            request["cache_generation"] = self.response_cache.generation
+            with tracer.span("response_cache") as span:
+                request["response"], request["query_vector"] = yield "lookup", (query,)
+                span.set("cache_hit", request["response"] is not None)
+        
+        if info is not None:
+            info["cache_hit"] = request["response"] is not None
+        if request["response"] is not None:
+            request_span.set("route", "cached")
+            if info is not None:
+                info["route"] = "cached"
+            return request
+        
+        # Only reached on a cache miss, so cached answers cost no retrieval or
+        # summarisation. Each agent gets as much history as its token budget allows.
+        with tracer.span("history_window"):
+            chat_window = yield "window", (session_id, messages, self.routing_history_tokens)
+            main_window = yield "window", (session_id, messages, self.main_history_tokens)
+        with tracer.span("pack_cv"):
+            cv = yield "pack", (query, CV_ROUTE)
+        agent_input = {
+            "input": query,
+            "cv": cv,
+            "chat_history": chat_window,
+            "main_chat_history": main_window
+        }
+        with tracer.span("routing") as span:
+            route, response = yield "route", (agent_input,)
+            span.set("route", str(route))
+        request_span.set("route", str(route))
+        if info is not None:
+            info["route"] = str(route)
+        request["route"] = route
+        
+        if response is None:
+            context = yield "retrieve", (route, query)
+            request["agent"], request["chain_input"], response = self._select_agent(route, agent_input, context)
+        request["response"] = response
+        return request
+
+    def _finish_request(self, request, response):
+        """
+        Cache the answer if it may be shared and add the turn to the chat history.
+        """
+        if request["cacheable"] and request["route"] is not None:
+            self.response_cache.put(
+                request["input"], response, request["query_vector"], request["cache_generation"]
+            )
+        request["chat_history"].add_user_message(request["input"])
+        request["chat_history"].add_ai_message(response)
+
+    def route_query_stream(self, input_dict, session_id, info=None):
+        """
+        Route the query and stream the chosen agent's response.
+        
+        The final text is added to the chat history (and the response cache)
+        once streaming completes.
+        
+        Args:
+            input_dict (dict): Input dictionary containing query and context
+            session_id (str): Current session identifier
+            info (dict, optional): Receives the request's "route" (a route
+                label, "cached" or "None") and "cache_hit".
+        
+        Yields:
+            str: Successive chunks of the response
+        """
+        with tracer.span("route_query", routing_mode=self.routing_mode) as request_span:
+            request = run_flow(self._prepare_flow(input_dict, session_id, request_span, info), self._steps())
+            response = request["response"]
+            if request["agent"] is None:
+                yield response
+            else:
+                chunks = []
+                with tracer.span("generation", route=str(request["route"])):
+                    for chunk in request["agent"].stream(request["chain_input"]):
+                        chunks.append(chunk)
+                        yield chunk
+                response = "".join(chunks)
+            self._finish_request(request, response)
+
+    def route_query(self, input_dict, session_id, info=None):
+        """
+        Route the query to the appropriate agent based on context and data source.
+        
+        Args:
+            input_dict (dict): Input dictionary containing query and context
+            session_id (str): Current session identifier
+            info (dict, optional): Receives the request's route and cache hit.
+        
+        Returns:
+            str: Response from the appropriate agent
+        """
+        return "".join(self.route_query_stream(input_dict, session_id, info))
+
+    def _request_slot(self):
+        """
+        Semaphore bounding the number of concurrently processed async requests.
+        """
+        if self._request_semaphore is None:
+            self._request_semaphore = asyncio.Semaphore(self.max_concurrent_requests)
+        return self._request_semaphore
+
+    async def aroute_query_stream(self, input_dict, session_id, info=None):
+        """
+        Async variant of route_query_stream built on ainvoke/astream.
+        
+        At most max_concurrent_requests queries are processed at once;
+        further requests wait for a free slot.
+        
+        Args:
+            input_dict (dict): Input dictionary containing query and context
+            session_id (str): Current session identifier
+            info (dict, optional): Receives the request's route and cache hit.
+        
+        Yields:
+            str: Successive chunks of the response
+        """
+        async with self._request_slot():
+            with tracer.span("route_query", routing_mode=self.routing_mode) as request_span:
+                request = await arun_flow(
+                    self._prepare_flow(input_dict, session_id, request_span, info), self._asteps()
+                )
+                response = request["response"]
+                if request["agent"] is None:
+                    yield response
                 else:
-                    response = "Error in routing the query."
+                    chunks = []
+                    with tracer.span("generation", route=str(request["route"])):
+                        async for chunk in request["agent"].astream(request["chain_input"]):
+                            chunks.append(chunk)
+                            yield chunk
+                    response = "".join(chunks)
+                self._finish_request(request, response)
+
+    async def aroute_query(self, input_dict, session_id, info=None):
+        """
+        Async variant of route_query.
+        
+        Returns:
+            str: Response from the appropriate agent
+        """
+        chunks = []
+        async for chunk in self.aroute_query_stream(input_dict, session_id, info):
+            chunks.append(chunk)
+        return "".join(chunks)
+
+    def reset_session(self, session_id):
+        """
+        Reset a session's chat history and its cached summary.
+        
+        Args:
+            session_id (str): Session identifier to reset.
+        """
+        self.chat_handler.reset_session_history(session_id)
+        self.history_manager.forget(session_id)
+
+    def _session_id(self, request):
+        """
+        Session identifier for a Gradio request.
+        
+        Args:
+            request (gr.Request or None): Request injected by Gradio.
+        
+        Returns:
+            str: The browser session's hash, or a fresh ID outside Gradio.
+        """
+        if request is not None and getattr(request, "session_hash", None):
+            return request.session_hash
+        return self.chat_handler.generate_session_id()
+
+    @staticmethod
+    def _shown_messages(history):
+        """
+        Messages of a Gradio chat history as (type, content) pairs.
+        
+        Args:
+            history (list): Either [user, bot] pairs or role/content dicts.
+        
+        Returns:
+            list[tuple]: ("human" or "ai", text) in conversation order.
+        """
+        shown = []
+        for item in history or []:
+            if isinstance(item, dict):
+                shown.append(("human" if item.get("role") == "user" else "ai", str(item.get("content"))))
             else:
-                response = "Unable to determine the appropriate data source."
+                user, bot = item[0], item[1]
+                if user is not None:
+                    shown.append(("human", str(user)))
+                if bot is not None:
+                    shown.append(("ai", str(bot)))
+        return shown
+
+    def _sync_session(self, session_id, history):
+        """
+        Make the stored conversation match the one shown in the browser.
         
-        # Add messages to chat history
-        chat_history.add_user_message(input_dict["input"])
-        chat_history.add_ai_message(response)
+        Clear, Retry and Undo only change the browser's copy of the chat.
+        When the stored messages are no longer the tail of what the browser
+        shows, the session is reset and refilled from the browser's history,
+        so a cleared chat starts afresh (and can be answered from the cache).
         
-        return response
+        Args:
+            session_id (str): Session identifier.
+            history (list): Chat history sent by Gradio.
+        """
+        shown = self._shown_messages(history)
+        stored = [
+            (message.type, message.content)
+            for message in self.chat_handler.get_session_history(session_id).messages
+        ]
+        # Stored histories may be trimmed from the front, so compare with the tail
+        if len(stored) <= len(shown) and shown[len(shown) - len(stored):] == stored:
+            return
+        self.reset_session(session_id)
+        if shown:
+            chat_history = self.chat_handler.get_session_history(session_id)
+            for message_type, content in shown:
+                if message_type == "human":
+                    chat_history.add_user_message(content)
+                else:
+                    chat_history.add_ai_message(content)
 
-    def chat_interaction(self, message, history):
+    def chat_interaction(self, message, history, request: gr.Request = None):
         """
         Handle chat interactions for the profile chatbot.
         
         Args:
             message (str): User's input message
             history (list): Chat history of previous interactions
+            request (gr.Request, optional): Gradio request, used to keep one session per browser tab
         
-        Returns:
-            str: Bot's response
+        Yields:
+            str: Bot's response so far, growing as tokens arrive
         """
-        # Generate a unique session ID
-        session_id = self.chat_handler.generate_session_id()
+        session_id = self._session_id(request)
+        self._sync_session(session_id, history)
         
+        partial = ""
         try:
-            # Route the query
-            response = self.route_query(
+            # Route the query and stream the answer
+            for chunk in self.route_query_stream(
                 {
                     "input": message
                 },
                 session_id
-            )
-            
-            return response
+            ):
+                partial += chunk
+                yield partial
+        
+        except Exception as e:
+            yield f"An error occurred: {str(e)}"
+
+    async def achat_interaction(self, message, history, request: gr.Request = None):
+        """
+        Async variant of chat_interaction used by the Gradio interface.
+        
+        Args:
+            message (str): User's input message
+            history (list): Chat history of previous interactions
+            request (gr.Request, optional): Gradio request, used to keep one session per browser tab
+        
+        Yields:
+            str: Bot's response so far, growing as tokens arrive
+        """
+        session_id = self._session_id(request)
+        self._sync_session(session_id, history)
+        
+        partial = ""
+        try:
+            async for chunk in self.aroute_query_stream({"input": message}, session_id):
+                partial += chunk
+                yield partial
         
         except Exception as e:
-            return f"An error occurred: {str(e)}"
+            yield f"An error occurred: {str(e)}"
 
     def launch_chat_interface(self):
         """
         Launch the Gradio chat interface.
         """
         iface = gr.ChatInterface(
-            fn=self.chat_interaction,
+            fn=self.achat_interaction,
             title="Sarwesh Profile Chatbot",
             description=(
                 "Ask questions about Sarwesh's profile, experience, education, "
@@ -202,7 +873,13 @@ class ProfileQuerySystem:
             cache_examples=False
         )
         
-        iface.launch(share=True, debug=True)
+        iface.queue(default_concurrency_limit=self.max_concurrent_requests)
+        # debug=True would make launch() block, so the warm-up below would never run
+        iface.launch(share=True, prevent_thread_lock=True)
+        if os.getenv("WARM_UP", "true").lower() in ("1", "true", "yes"):
+            # Build the remaining sources while the UI is already serving
+            self.warm_up()
+        iface.block_thread()
 
 def main():
     """
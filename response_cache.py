@@ -0,0 +1,197 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class ResponseCache:
+    """
+    Bounded cache of final answers, matched by exact normalised text and
+    then by embedding similarity.
+
+    Entries are evicted least-recently-used once max_entries is reached and
+    expire ttl seconds after they were stored. Each entry records the
+    document version it was answered from and only matches while that is
+    still the cache's version.
+    """
+    def __init__(self, embeddings=None, max_entries=256, ttl=3600, similarity_threshold=0.92, version=None):
+        """
+        Initialize the response cache.
+
+        Args:
+            embeddings (Embeddings, optional): Backend for semantic matching.
+                Only exact matches are used when not provided.
+            max_entries (int, optional): Maximum number of cached answers.
+            ttl (float, optional): Seconds an answer stays valid.
+            similarity_threshold (float, optional): Minimum cosine similarity
+                for a semantic hit.
+            version (str, optional): Fingerprint of the documents answers were
+                generated from.
+        """
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.version = version
+        # Bumped by invalidate(); answers started under an older generation are not stored
+        self.generation = 0
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def normalize(query):
+        """
+        Normalise a query for exact matching.
+
+        Args:
+            query (str): User's question.
+
+        Returns:
+            str: Lower-cased query without punctuation or repeated whitespace.
+        """
+        return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+    @staticmethod
+    def _normalize_vector(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _embed(self, query):
+        return self._normalize_vector(self.embeddings.embed_query(query))
+
+    def _expire(self, now):
+        expired = [key for key, entry in self._entries.items() if now - entry["created"] > self.ttl]
+        for key in expired:
+            del self._entries[key]
+
+    def _current(self, entry):
+        return entry is not None and entry["version"] == self.version
+
+    def _lookup_exact(self, query):
+        key = self.normalize(query)
+        with self._lock:
+            self._expire(time.time())
+            entry = self._entries.get(key)
+            if self._current(entry):
+                self._entries.move_to_end(key)
+                self.exact_hits += 1
+                return entry["response"], []
+            if self.embeddings is None:
+                self.misses += 1
+            return None, [
+                (k, e["vector"]) for k, e in self._entries.items()
+                if e["vector"] is not None and self._current(e)
+            ]
+
+    def _lookup_semantic(self, candidates, vector):
+        if candidates:
+            similarities = np.vstack([v for _, v in candidates]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.similarity_threshold:
+                with self._lock:
+                    entry = self._entries.get(candidates[best][0])
+                    if self._current(entry):
+                        self._entries.move_to_end(candidates[best][0])
+                        self.semantic_hits += 1
+                        return entry["response"]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def lookup(self, query):
+        """
+        Find a cached answer for a query.
+
+        Args:
+            query (str): User's question.
+
+        Returns:
+            tuple: (cached response or None, query embedding or None). The
+                embedding can be passed back to put() to avoid recomputing it.
+        """
+        response, candidates = self._lookup_exact(query)
+        if response is not None or self.embeddings is None:
+            return response, None
+        vector = self._embed(query)
+        return self._lookup_semantic(candidates, vector), vector
+
+    async def alookup(self, query):
+        """
+        Async variant of lookup() that embeds the query without blocking.
+
+        Args:
+            query (str): User's question.
+
+        Returns:
+            tuple: (cached response or None, query embedding or None).
+        """
+        response, candidates = self._lookup_exact(query)
+        if response is not None or self.embeddings is None:
+            return response, None
+        vector = self._normalize_vector(await self.embeddings.aembed_query(query))
+        return self._lookup_semantic(candidates, vector), vector
+
+    def put(self, query, response, vector=None, generation=None):
+        """
+        Store the answer to a query.
+
+        Args:
+            query (str): User's question.
+            response (str): Final answer.
+            vector (array, optional): Query embedding returned by lookup().
+            generation (int, optional): Value of self.generation when the
+                request started; the answer is dropped if the cache has been
+                invalidated since, as it may be built from the old documents.
+        """
+        if generation is not None and generation != self.generation:
+            return
+        if vector is None and self.embeddings is not None:
+            vector = self._embed(query)
+        key = self.normalize(query)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = {
+                "response": response, "vector": vector, "version": self.version, "created": time.time()
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, version=None):
+        """
+        Drop every cached answer, e.g. after the underlying documents changed.
+
+        Args:
+            version (str, optional): Fingerprint of the new documents.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.version = version
+            self.generation += 1
+
+    def stats(self):
+        """
+        Hit-rate metrics for the cache.
+
+        Returns:
+            dict: Hit, miss and eviction counts, current size and hit rate.
+        """
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,181 @@
+import json
+import os
+import re
+
+CV_ROUTE = "cv"
+NONE_ROUTE = "none"
+OFF_TOPIC_ROUTE = "off_topic"
+
+
+class Source:
+    """
+    A document set the chatbot can answer from, as declared in the registry config.
+    """
+    def __init__(self, name, title, description, files, prompt, chunking="splitter",
+                 top_k=5, include_cv=True, examples=None):
+        """
+        Initialize a source.
+
+        Args:
+            name (str): Identifier used as the route label and index metadata.
+            title (str): Human-readable name used in prompts.
+            description (str): What the source contains, shown to the routing agents.
+            files (list[str]): Files whose texts are joined to form the source.
+            prompt (str): System prompt of the source's answer agent.
+            chunking (str, optional): "splitter" for fixed-size chunks retrieved by
+                relevance, or "sections" for section chunks packed up to a token budget.
+            top_k (int, optional): Chunks retrieved per query with "splitter" chunking.
+            include_cv (bool, optional): Whether the answer agent also sees the CV.
+            examples (list[str], optional): Example questions for the local intent router.
+        """
+        self.name = name
+        self.title = title
+        self.description = description
+        self.files = files
+        self.prompt = prompt
+        self.chunking = chunking
+        self.top_k = top_k
+        self.include_cv = include_cv
+        self.examples = examples or []
+
+
+class SourceRegistry:
+    """
+    Config-driven list of the data sources and the routes derived from them.
+
+    Routing prompts number the sources in registry order, followed by the
+    "none" and "off topic" options; the CV route is numbered 0 where used.
+    """
+    def __init__(self, profile_name, cv_files, sources, data_dir="",
+                 none_examples=None, off_topic_examples=None):
+        """
+        Initialize the registry.
+
+        Args:
+            profile_name (str): Name of the person the profile describes.
+            cv_files (list[str]): Files making up the CV.
+            sources (list[Source]): Additional data sources, in routing order.
+            data_dir (str, optional): Directory that file names are relative to.
+            none_examples (list[str], optional): Router examples for profile questions
+                none of the sources can answer.
+            off_topic_examples (list[str], optional): Router examples for unrelated questions.
+        """
+        self.profile_name = profile_name
+        self.cv_files = cv_files
+        self.sources = sources
+        self.data_dir = data_dir
+        self.none_examples = none_examples or []
+        self.off_topic_examples = off_topic_examples or []
+        self._by_name = {source.name: source for source in sources}
+        if CV_ROUTE in self._by_name or NONE_ROUTE in self._by_name or OFF_TOPIC_ROUTE in self._by_name:
+            raise ValueError(f"Source names '{CV_ROUTE}', '{NONE_ROUTE}' and '{OFF_TOPIC_ROUTE}' are reserved.")
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a registry from a JSON config file.
+
+        Args:
+            path (str): Path to the config file.
+
+        Returns:
+            SourceRegistry: The loaded registry.
+        """
+        with open(path) as f:
+            config = json.load(f)
+        return cls(
+            profile_name=config["profile_name"],
+            cv_files=config["cv_files"],
+            sources=[Source(**source) for source in config["sources"]],
+            data_dir=config.get("data_dir", ""),
+            none_examples=config.get("none_examples"),
+            off_topic_examples=config.get("off_topic_examples"),
+        )
+
+    def get(self, name):
+        """
+        Look up a source by name.
+
+        Returns:
+            Source or None: The source, or None for non-source routes.
+        """
+        return self._by_name.get(name)
+
+    def document_paths(self):
+        """
+        Paths of every document to load, keyed by source name (the CV under "cv").
+
+        Returns:
+            dict: Maps names to lists of file paths.
+        """
+        paths = {CV_ROUTE: [os.path.join(self.data_dir, f) for f in self.cv_files]}
+        for source in self.sources:
+            paths[source.name] = [os.path.join(self.data_dir, f) for f in source.files]
+        return paths
+
+    def chunking(self):
+        """
+        Chunking strategy of every document, keyed by name. The CV is packed by section.
+
+        Returns:
+            dict: Maps names to "sections" or "splitter".
+        """
+        chunking = {CV_ROUTE: "sections"}
+        chunking.update({source.name: source.chunking for source in self.sources})
+        return chunking
+
+    def _routes(self, include_cv):
+        routes = [(CV_ROUTE, "The question can be answered using the provided CV and chat history")] if include_cv else []
+        routes += [(source.name, f"{source.title}: {source.description}") for source in self.sources]
+        routes.append((NONE_ROUTE, "None of the above data are relevant to the question"))
+        routes.append((OFF_TOPIC_ROUTE, f"The Question is not relevant to {self.profile_name}"))
+        return routes
+
+    def numbered_options(self, include_cv=False):
+        """
+        Numbered list of routes for routing prompts.
+
+        Args:
+            include_cv (bool, optional): Include the CV as option 0.
+
+        Returns:
+            str: One "<number>. <description>" line per route.
+        """
+        start = 0 if include_cv else 1
+        return "\n".join(
+            f"{number}. {description}"
+            for number, (_, description) in enumerate(self._routes(include_cv), start=start)
+        )
+
+    def parse_route(self, response, include_cv=False):
+        """
+        Map a routing agent's numbered answer back to a route label.
+
+        Args:
+            response (str): Agent response containing the chosen number.
+            include_cv (bool, optional): Whether option 0 (the CV) was offered.
+
+        Returns:
+            str or None: Route label, or None if no valid number was found.
+        """
+        routes = self._routes(include_cv)
+        start = 0 if include_cv else 1
+        for match in re.finditer(r'\b\d+\b', response):
+            index = int(match.group()) - start
+            if 0 <= index < len(routes):
+                return routes[index][0]
+        return None
+
+    def route_examples(self):
+        """
+        Labelled example questions for the local intent router.
+
+        Returns:
+            dict: Maps route labels to example questions; routes without examples are omitted.
+        """
+        examples = {source.name: source.examples for source in self.sources if source.examples}
+        if self.none_examples:
+            examples[NONE_ROUTE] = self.none_examples
+        if self.off_topic_examples:
+            examples[OFF_TOPIC_ROUTE] = self.off_topic_examples
+        return examples
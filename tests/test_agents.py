@@ -0,0 +1,64 @@
+"""
+Tests for the agent chains against the offline FakeChatModel.
+
+Run with: python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("langchain_google_genai")
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from agents import AgentManager
+from fakes import FakeChatModel
+from llm_governor import LLMGovernor
+
+CHAIN_INPUT = {"input": "Where did Sarwesh study?", "cv": "Education: example university", "chat_history": ""}
+ANSWER = " ".join(["Simulated", "answer"] + [f"token{i}" for i in range(3)])
+
+
+def make_agents(governor=None):
+    return AgentManager(llm=FakeChatModel(response_tokens=5), governor=governor)
+
+
+def test_main_agent_streams_an_answer():
+    chain = make_agents().create_main_agent()
+
+    chunks = list(chain.stream(CHAIN_INPUT))
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == ANSWER
+
+
+def test_main_agent_astreams_an_answer():
+    chain = make_agents().create_main_agent()
+
+    async def main():
+        return [chunk async for chunk in chain.astream(CHAIN_INPUT)]
+
+    assert "".join(asyncio.run(main())) == ANSWER
+
+
+def test_main_agent_streams_under_the_governor():
+    governor = LLMGovernor(rate=0)
+    chain = make_agents(governor).create_main_agent()
+
+    assert "".join(chain.stream(CHAIN_INPUT)) == ANSWER
+    assert governor.stats()["calls"] == 1
+    assert governor.stats()["active"] == 0
+
+
+def test_main_agent_prompt_receives_the_input():
+    chain = make_agents().create_main_agent()
+
+    prompt = chain.first.invoke(CHAIN_INPUT).to_string()
+
+    assert CHAIN_INPUT["input"] in prompt
+    assert CHAIN_INPUT["cv"] in prompt
@@ -0,0 +1,26 @@
+"""
+Tests for TokenChunker.
+
+Run with: python -m pytest tests
+"""
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from chunker import TokenChunker
+
+
+def test_heading_is_carried_into_the_pieces_of_a_long_line():
+    chunker = TokenChunker(chunk_tokens=40)
+    long_line = " ".join(f"word{i}" for i in range(120))
+    text = f"INTRO\nA short line.\n\nEXPERIENCE\n{long_line}"
+
+    chunks = chunker.chunk(text)
+
+    assert [chunk["text"] for chunk in chunks if chunk["text"].strip() == "EXPERIENCE"] == []
+    pieces = [chunk for chunk in chunks if chunk["text"].startswith("EXPERIENCE\n")]
+    assert len(pieces) > 1
+    assert all(chunk["tokens"] <= 40 for chunk in pieces)
+    assert " ".join(chunk["text"].split("\n", 1)[1] for chunk in pieces) == long_line
@@ -0,0 +1,53 @@
+"""
+Tests for ContextPacker against the offline FakeEmbeddings.
+
+Run with: python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("langchain_google_genai")
+pytest.importorskip("faiss")
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from context_packer import ContextPacker
+from fakes import FakeEmbeddings
+from tokens import count_tokens
+from vector_store import VectorStoreManager
+
+CV = "\n".join([
+    "EXPERIENCE",
+    "Led the payments platform at Acme, migrating card processing to a new ledger and cutting failures by half.",
+    "EDUCATION",
+    "Studied computer science at the University of Leeds, with a thesis on distributed consensus protocols.",
+])
+
+
+@pytest.fixture
+def packer():
+    packer = ContextPacker(VectorStoreManager(embeddings=FakeEmbeddings(), cache_dir=None))
+    packer.add_sources({"cv": CV}, {"cv": "sections"})
+    return packer
+
+
+def test_sections_over_budget_leave_a_truncated_top_section(packer):
+    context = packer.pack("Where did Alex study?", "cv", budget=8)
+
+    assert context
+    assert count_tokens(context) <= 8
+    assert any(section.startswith(context) for section in packer._snapshot[1]["cv"]["chunks"])
+
+
+def test_sections_within_budget_are_packed_whole(packer):
+    sections = packer._snapshot[1]["cv"]["chunks"]
+    budget = max(count_tokens(section) for section in sections)
+
+    context = packer.pack("Where did Alex study?", "cv", budget=budget)
+
+    assert context in sections
@@ -0,0 +1,56 @@
+"""
+Tests for the on-disk centroid cache of IntentRouter against the offline
+FakeEmbeddings.
+
+Run with: python -m pytest tests
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("faiss")
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fakes import FakeEmbeddings
+from index_cache import IndexCache
+from intent_router import IntentRouter
+
+EXAMPLES = {
+    "projects": ["Which projects has Alex led?", "Tell me about the payments project"],
+    "none": ["What is Alex's favourite food?"],
+}
+
+
+def fit(cache, examples=EXAMPLES, model=None):
+    embeddings = FakeEmbeddings()
+    router = IntentRouter(embeddings, examples, cache=cache, model=model)
+    router.ensure_fitted()
+    return router, embeddings
+
+
+def test_restart_reuses_cached_centroids(tmp_path):
+    first, first_embeddings = fit(IndexCache(str(tmp_path)))
+    second, second_embeddings = fit(IndexCache(str(tmp_path)))
+
+    assert first_embeddings.texts == 3
+    assert second_embeddings.texts == 0
+    assert second._routes == first._routes
+    np.testing.assert_allclose(second._centroids, first._centroids)
+    query = "Which projects did Alex lead?"
+    assert second.route(query)["scores"] == pytest.approx(first.route(query)["scores"])
+
+
+def test_changed_examples_or_model_are_embedded_again(tmp_path):
+    fit(IndexCache(str(tmp_path)))
+
+    _, embeddings = fit(IndexCache(str(tmp_path)), {**EXAMPLES, "none": ["Does Alex have siblings?"]})
+    assert embeddings.texts == 3
+
+    _, embeddings = fit(IndexCache(str(tmp_path)), model="another-model")
+    assert embeddings.texts == 3
@@ -0,0 +1,224 @@
+"""
+Tests for LLMGovernor and GovernedChatModel against the offline FakeChatModel.
+
+Run with: python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from langchain_core.messages import HumanMessage
+
+from fakes import FakeChatModel
+from llm_governor import GovernedChatModel, LLMGovernor
+
+_streams_lock = threading.Lock()
+
+
+class TrackingChatModel(FakeChatModel):
+    """
+    FakeChatModel that records how many streams are open at once.
+    """
+    open_streams: int = 0
+    peak_streams: int = 0
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        with _streams_lock:
+            self.open_streams += 1
+            self.peak_streams = max(self.peak_streams, self.open_streams)
+        try:
+            yield from super()._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+        finally:
+            with _streams_lock:
+                self.open_streams -= 1
+
+
+def make_governor(**kwargs):
+    settings = {"rate": 0, "max_concurrency": 4, "max_retries": 8, "base_delay": 0.001, "max_delay": 0.01}
+    settings.update(kwargs)
+    return LLMGovernor(**settings)
+
+
+def prompt(text="What does the candidate do?"):
+    return [HumanMessage(content=text)]
+
+
+def test_retries_transient_errors():
+    fake = FakeChatModel(error_rate=0.5, seed=3)
+    governor = make_governor()
+    model = GovernedChatModel(model=fake, governor=governor)
+
+    answers = [model.invoke(prompt(f"question {i}")).content for i in range(20)]
+
+    assert all(answer.startswith("Simulated answer") for answer in answers)
+    stats = governor.stats()
+    assert stats["retries"] > 0
+    assert stats["retries"] == fake.calls - 20
+    assert stats["errors"] == 0
+    assert stats["active"] == 0
+
+
+def test_gives_up_after_max_retries():
+    fake = FakeChatModel(error_rate=1.0)
+    governor = make_governor(max_retries=2)
+    model = GovernedChatModel(model=fake, governor=governor)
+
+    with pytest.raises(RuntimeError, match="429"):
+        model.invoke(prompt())
+
+    assert fake.calls == 3
+    assert governor.stats()["errors"] == 1
+    assert governor.stats()["active"] == 0
+
+
+def test_stream_retries_until_first_chunk():
+    fake = FakeChatModel(error_rate=0.5, seed=5, response_tokens=5)
+    governor = make_governor()
+    model = GovernedChatModel(model=fake, governor=governor)
+
+    texts = ["".join(chunk.content for chunk in model.stream(prompt(f"question {i}"))) for i in range(10)]
+
+    assert texts == ["Simulated answer token0 token1 token2"] * 10
+    assert governor.stats()["retries"] == fake.calls - 10
+    assert governor.stats()["active"] == 0
+
+
+def test_streams_hold_a_slot_until_consumed():
+    fake = TrackingChatModel(token_latency=0.005, response_tokens=10)
+    governor = make_governor(max_concurrency=2)
+    model = GovernedChatModel(model=fake, governor=governor)
+
+    def consume(i):
+        return "".join(chunk.content for chunk in model.stream(prompt(f"question {i}")))
+
+    threads = [threading.Thread(target=consume, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fake.calls == 6
+    assert fake.peak_streams == 2
+    assert governor.stats()["active"] == 0
+
+
+def test_closing_a_stream_early_releases_its_slot():
+    fake = FakeChatModel(response_tokens=10)
+    governor = make_governor(max_concurrency=1)
+    model = GovernedChatModel(model=fake, governor=governor)
+
+    stream = model.stream(prompt())
+    next(stream)
+    assert governor.stats()["active"] == 1
+    stream.close()
+
+    assert governor.stats()["active"] == 0
+    assert model.invoke(prompt("another question")).content
+
+
+def test_single_flight_coalesces_identical_calls():
+    fake = FakeChatModel(latency=0.2)
+    governor = make_governor()
+    model = GovernedChatModel(model=fake, governor=governor)
+    barrier = threading.Barrier(5)
+    answers = []
+
+    def ask():
+        barrier.wait()
+        answers.append(model.invoke(prompt()).content)
+
+    threads = [threading.Thread(target=ask) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert fake.calls == 1
+    assert len(answers) == 5 and len(set(answers)) == 1
+    assert governor.stats()["coalesced"] == 4
+
+
+def test_async_single_flight_coalesces_identical_calls():
+    fake = FakeChatModel(latency=0.1)
+    governor = make_governor()
+    model = GovernedChatModel(model=fake, governor=governor)
+
+    async def main():
+        return await asyncio.gather(*(model.ainvoke(prompt()) for _ in range(5)))
+
+    answers = asyncio.run(main())
+
+    assert fake.calls == 1
+    assert len({answer.content for answer in answers}) == 1
+    assert governor.stats()["coalesced"] == 4
+
+
+def test_cancelled_leader_does_not_fail_followers():
+    fake = FakeChatModel(latency=0.2)
+    governor = make_governor()
+    model = GovernedChatModel(model=fake, governor=governor)
+
+    async def main():
+        leader = asyncio.ensure_future(model.ainvoke(prompt()))
+        await asyncio.sleep(0.05)
+        followers = [asyncio.ensure_future(model.ainvoke(prompt())) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        answers = await asyncio.gather(*followers)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return answers
+
+    answers = asyncio.run(main())
+
+    assert fake.calls == 1
+    assert all(answer.content.startswith("Simulated answer") for answer in answers)
+    assert governor.stats()["active"] == 0
+
+
+def test_cancelled_leader_without_followers_cancels_the_call():
+    fake = FakeChatModel(latency=0.2)
+    governor = make_governor()
+    model = GovernedChatModel(model=fake, governor=governor)
+
+    async def main():
+        leader = asyncio.ensure_future(model.ainvoke(prompt()))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # Let the cancelled request task unwind
+        await asyncio.sleep(0.01)
+        assert governor.stats()["active"] == 0
+        # The cancelled call is no longer in flight, so this one is sent anew
+        return await model.ainvoke(prompt())
+
+    answer = asyncio.run(main())
+
+    assert answer.content.startswith("Simulated answer")
+    assert fake.calls == 2
+    assert governor.stats()["coalesced"] == 0
+
+
+def test_rate_limit_throttles_bursts():
+    fake = FakeChatModel()
+    governor = make_governor(rate=20, burst=1)
+    model = GovernedChatModel(model=fake, governor=governor)
+
+    started = time.monotonic()
+    for i in range(5):
+        model.invoke(prompt(f"question {i}"))
+    elapsed = time.monotonic() - started
+
+    assert governor.stats()["throttled"] == 4
+    assert elapsed >= 4 / 20 * 0.9
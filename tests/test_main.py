@@ -0,0 +1,82 @@
+"""
+Tests for the sync and async request paths of ProfileQuerySystem against
+the offline fake models.
+
+Run with: python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("langchain_google_genai")
+pytest.importorskip("gradio")
+pytest.importorskip("faiss")
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fakes import FakeChatModel, FakeEmbeddings
+from main import ProfileQuerySystem
+from synthetic import make_corpus, make_queries
+
+
+@pytest.fixture
+def system(tmp_path, monkeypatch):
+    config_path, documents = make_corpus(str(tmp_path / "data"), sources=2, pages=3, cv_pages=1)
+    for name, value in {
+        "TEXT_CACHE_DIR": str(tmp_path / "text"),
+        "INDEX_CACHE_DIR": str(tmp_path / "index"),
+        "WATCH_DOCUMENTS": "false",
+        "WARM_UP": "false",
+        "LLM_GOVERNOR": "false",
+        "RESPONSE_CACHE": "true",
+    }.items():
+        monkeypatch.setenv(name, value)
+    system = ProfileQuerySystem(
+        sources_config=config_path, llm=FakeChatModel(response_tokens=3), embeddings=FakeEmbeddings()
+    )
+    system.queries = [query for query, _ in make_queries(documents, 4, seed=1)]
+    return system
+
+
+def history(system, session_id):
+    return [message.content for message in system.chat_handler.get_session_history(session_id).messages]
+
+
+def test_route_query_answers_and_records_history(system):
+    query = system.queries[0]
+    info = {}
+
+    answer = system.route_query({"input": query}, "sync", info)
+
+    assert answer
+    assert info["cache_hit"] is False
+    assert history(system, "sync") == [query, answer]
+
+
+def test_aroute_query_matches_route_query(system):
+    query = system.queries[1]
+    sync_info, async_info = {}, {}
+
+    answer = system.route_query({"input": query}, "sync", sync_info)
+    async_answer = asyncio.run(system.aroute_query({"input": query}, "async", async_info))
+
+    assert async_answer == answer
+    assert async_info["route"] in (sync_info["route"], "cached")
+    assert history(system, "async") == [query, async_answer]
+
+
+def test_async_stream_yields_the_recorded_answer(system):
+    query = system.queries[2]
+
+    async def collect():
+        return [chunk async for chunk in system.aroute_query_stream({"input": query}, "stream")]
+
+    chunks = asyncio.run(collect())
+
+    assert chunks
+    assert history(system, "stream") == [query, "".join(chunks)]
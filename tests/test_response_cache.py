@@ -0,0 +1,41 @@
+"""
+Tests for ResponseCache against the offline FakeEmbeddings.
+
+Run with: python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fakes import FakeEmbeddings
+from response_cache import ResponseCache
+
+QUERY = "Where did Alex study?"
+
+
+@pytest.mark.parametrize("embeddings", [None, FakeEmbeddings()], ids=["exact", "semantic"])
+def test_entries_of_another_version_do_not_match(embeddings):
+    cache = ResponseCache(embeddings, similarity_threshold=0.5, version="v1")
+    cache.put(QUERY, "At the University of Leeds.")
+    assert cache.lookup(QUERY)[0] == "At the University of Leeds."
+
+    cache.version = "v2"
+
+    assert cache.lookup(QUERY)[0] is None
+    assert cache.lookup("where did alex study")[0] is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_semantic_lookup_matches_entries_of_the_current_version():
+    cache = ResponseCache(FakeEmbeddings(), similarity_threshold=0.0, version="v1")
+    cache.put(QUERY, "At the University of Leeds.")
+
+    assert cache.lookup("Which university did Alex attend?")[0] == "At the University of Leeds."
+    assert cache.stats()["semantic_hits"] == 1
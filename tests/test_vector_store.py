@@ -0,0 +1,47 @@
+"""
+Tests for VectorStoreManager's index cache, using the offline FakeEmbeddings.
+
+Run with: python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fakes import FakeEmbeddings
+from synthetic import make_chunks
+from vector_store import VectorStoreManager
+
+
+def make_manager(cache_dir, index_type, embeddings):
+    return VectorStoreManager(embeddings=embeddings, cache_dir=cache_dir, index_type=index_type, mmap=True)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "sq_fp16", "ivf_pq"])
+def test_mmap_restart_only_embeds_edited_chunks(tmp_path, index_type):
+    chunks = make_chunks(400, seed=1)
+    make_manager(str(tmp_path), index_type, FakeEmbeddings()).create_vector_store_from_chunks(chunks)
+
+    # A restart loads the store memory-mapped from the cache without embedding anything
+    embeddings = FakeEmbeddings()
+    manager = make_manager(str(tmp_path), index_type, embeddings)
+    vector_store = manager.create_vector_store_from_chunks(chunks)
+    assert manager.index_cache.hits == 1
+    assert embeddings.texts == 0
+
+    edited = chunks[:-3] + ["An edited chunk.", "Another edited chunk.", "A third edited chunk."]
+    vectors, embedded = manager.embed_chunks(edited)
+
+    assert embedded == 3
+    assert embeddings.texts == 3
+    expected = FakeEmbeddings().embed_documents(chunks[:5])
+    for vector, reference in zip(vectors[:5], expected):
+        assert vector == pytest.approx(reference, abs=1e-3)
+    assert vector_store.index.ntotal == len(chunks)
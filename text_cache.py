@@ -0,0 +1,159 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+class TextCache:
+    """
+    Persistent cache of text extracted from source documents.
+
+    Entries are keyed by the file's path, size, modification time and
+    content hash. The page-level text of each file is stored as gzipped JSON
+    named after its content hash, so a hit never touches PyPDF2 or
+    python-docx.
+    """
+    def __init__(self, cache_dir=".text_cache"):
+        """
+        Initialize the text cache.
+
+        Args:
+            cache_dir (str, optional): Directory holding cached text.
+        """
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._read_index()
+
+    def _read_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".index-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _entry_path(self, content_hash):
+        return os.path.join(self.cache_dir, f"{content_hash}.json.gz")
+
+    @staticmethod
+    def _hash_file(file_path):
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def fingerprint(self, file_path):
+        """
+        Compute the fingerprint of a file.
+
+        The content hash is only recomputed when the size or mtime differs
+        from what the index recorded for this path.
+
+        Args:
+            file_path (str): Path to the source file.
+
+        Returns:
+            dict: size, mtime_ns and sha256 of the file.
+        """
+        stat = os.stat(file_path)
+        entry = self._index.get(os.path.abspath(file_path))
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            content_hash = entry["sha256"]
+        else:
+            content_hash = self._hash_file(file_path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": content_hash}
+
+    def get(self, file_path):
+        """
+        Look up the cached pages of a file.
+
+        Args:
+            file_path (str): Path to the source file.
+
+        Returns:
+            list[str] or None: Page-level text, or None on a miss.
+        """
+        try:
+            fingerprint = self.fingerprint(file_path)
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            with gzip.open(self._entry_path(fingerprint["sha256"]), "rt", encoding="utf-8") as f:
+                pages = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pages
+
+    def put(self, file_path, pages):
+        """
+        Store the extracted pages of a file.
+
+        Args:
+            file_path (str): Path to the source file.
+            pages (list[str]): Page-level text to cache.
+        """
+        fingerprint = self.fingerprint(file_path)
+        entry_path = self._entry_path(fingerprint["sha256"])
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix=".entry-")
+        os.close(fd)
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(pages, f)
+        os.replace(tmp_path, entry_path)
+        with self._lock:
+            self._index[os.path.abspath(file_path)] = fingerprint
+            self._write_index()
+
+    def invalidate(self, file_path):
+        """
+        Drop the cached text of a single file.
+
+        Args:
+            file_path (str): Path to the source file.
+        """
+        with self._lock:
+            entry = self._index.pop(os.path.abspath(file_path), None)
+            if entry is None:
+                return
+            # Entries are shared by identical files, so only delete unreferenced ones
+            if not any(e["sha256"] == entry["sha256"] for e in self._index.values()):
+                try:
+                    os.remove(self._entry_path(entry["sha256"]))
+                except OSError:
+                    pass
+            self._write_index()
+
+    def purge(self):
+        """
+        Remove every cached entry.
+        """
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json.gz"):
+                    os.remove(os.path.join(self.cache_dir, name))
+            self._index = {}
+            self._write_index()
+        print(f"Text cache '{self.cache_dir}' has been purged.")
+
+    def stats(self):
+        """
+        Hit/miss counters for the cache.
+
+        Returns:
+            dict: hits, misses and number of indexed files.
+        """
+        return {"hits": self.hits, "misses": self.misses, "files": len(self._index)}
@@ -0,0 +1,55 @@
+import re
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _ENCODING = None
+
+
+def count_tokens(text):
+    """
+    Count the tokens in a piece of text.
+
+    Uses tiktoken when it is installed; otherwise falls back to an estimate
+    of one token per word piece of roughly four characters.
+
+    Args:
+        text (str): Text to measure.
+
+    Returns:
+        int: Number of tokens.
+    """
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return sum(max(1, (len(word) + 3) // 4) for word in re.findall(r"\w+|[^\w\s]", text))
+
+
+def truncate_tokens(text, max_tokens):
+    """
+    Cut a piece of text down to at most max_tokens tokens.
+
+    Args:
+        text (str): Text to shorten.
+        max_tokens (int): Maximum number of tokens to keep.
+
+    Returns:
+        str: The longest prefix of the text within max_tokens, measured
+            the same way as count_tokens.
+    """
+    if not text or max_tokens <= 0:
+        return ""
+    if _ENCODING is not None:
+        ids = _ENCODING.encode(text, disallowed_special=())
+        return text if len(ids) <= max_tokens else _ENCODING.decode(ids[:max_tokens])
+    end, used = 0, 0
+    for match in re.finditer(r"\w+|[^\w\s]", text):
+        used += max(1, (len(match.group()) + 3) // 4)
+        if used > max_tokens:
+            break
+        end = match.end()
+    else:
+        return text
+    return text[:end]
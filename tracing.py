@@ -0,0 +1,356 @@
+import contextvars
+import json
+import math
+import threading
+import time
+import uuid
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from tokens import count_tokens
+
+# Upper bounds in seconds of the stage duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+def percentile(ordered, p):
+    """
+    Nearest-rank percentile of a sorted list: the smallest value with at
+    least a share p of the values at or below it.
+    """
+    # Rounding keeps float error (0.07 * 100 = 7.000000000000001) from skipping a rank
+    rank = math.ceil(round(p * len(ordered), 9))
+    return ordered[min(len(ordered), max(1, rank)) - 1]
+
+
+class Metrics:
+    """
+    Counters, gauges and duration histograms rendered in the Prometheus text format.
+    """
+    def __init__(self, prefix="profile_query"):
+        """
+        Initialize the metrics.
+
+        Args:
+            prefix (str, optional): Prefix of every metric name.
+        """
+        self.prefix = prefix
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        """
+        Increase a counter.
+        """
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def set(self, name, value, **labels):
+        """
+        Set a gauge, e.g. a current queue depth.
+        """
+        with self._lock:
+            self._gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, seconds, **labels):
+        """
+        Record a duration in a histogram.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(DURATION_BUCKETS), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    histogram["buckets"][i] += 1
+            histogram["sum"] += seconds
+            histogram["count"] += 1
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(
+            '{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+            for key, value in pairs
+        ) + "}"
+
+    def render(self):
+        """
+        Render every metric.
+
+        Returns:
+            str: Metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            by_name = defaultdict(list)
+            for (name, labels), value in self._counters.items():
+                by_name[name].append((labels, value))
+            for name in sorted(by_name):
+                metric = f"{self.prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in sorted(by_name[name]):
+                    lines.append(f"{metric}{self._labels(labels)} {value:g}")
+
+            by_name = defaultdict(list)
+            for (name, labels), value in self._gauges.items():
+                by_name[name].append((labels, value))
+            for name in sorted(by_name):
+                metric = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {metric} gauge")
+                for labels, value in sorted(by_name[name]):
+                    lines.append(f"{metric}{self._labels(labels)} {value:g}")
+
+            by_name = defaultdict(list)
+            for (name, labels), histogram in self._histograms.items():
+                by_name[name].append((labels, histogram))
+            for name in sorted(by_name):
+                metric = f"{self.prefix}_{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in sorted(by_name[name], key=lambda item: item[0]):
+                    for bound, count in zip(DURATION_BUCKETS, histogram["buckets"]):
+                        lines.append(f"{metric}_bucket{self._labels(labels, [('le', f'{bound:g}')])} {count}")
+                    lines.append(f"{metric}_bucket{self._labels(labels, [('le', '+Inf')])} {histogram['count']}")
+                    lines.append(f"{metric}_sum{self._labels(labels)} {histogram['sum']:g}")
+                    lines.append(f"{metric}_count{self._labels(labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+class Span:
+    """
+    A timed stage of a request with its LLM usage and attributes.
+    """
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.parent = None
+        self.trace_id = None
+        self.children = []
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.started = None
+        self.seconds = None
+        self._token = None
+
+    def set(self, key, value):
+        """
+        Set an attribute, e.g. the chosen route or a cache hit.
+        """
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self.trace_id = self.parent.trace_id if self.parent else uuid.uuid4().hex
+        if self.parent:
+            self.parent.children.append(self)
+        self._token = _current_span.set(self)
+        self.started = time.time()
+        self._perf_started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._perf_started
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Generators may be resumed from a different context than they started in
+            _current_span.set(self.parent)
+        self.tracer._finish(self)
+        return False
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "start": self.started,
+            "seconds": self.seconds,
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "attributes": self.attributes,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class _NoopSpan:
+    """
+    Span returned while tracing is disabled; every operation does nothing.
+    """
+    def set(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    Records spans around request stages and feeds them into metrics and an
+    optional JSONL trace file (one line per request).
+
+    Disabled tracers hand out a shared no-op span, so instrumented code costs
+    a single attribute check.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.metrics = Metrics()
+        self.trace_path = None
+        self._file_lock = threading.Lock()
+
+    def configure(self, enabled=True, trace_path=None):
+        """
+        Enable or disable tracing.
+
+        Args:
+            enabled (bool, optional): Whether spans are recorded.
+            trace_path (str, optional): JSONL file that finished request traces are appended to.
+        """
+        self.trace_path = trace_path
+        self.enabled = enabled
+
+    def span(self, name, **attributes):
+        """
+        Start a span; use as a context manager.
+
+        Args:
+            name (str): Stage name.
+            **attributes: Initial attributes.
+
+        Returns:
+            Span: The span, or a no-op span when tracing is disabled.
+        """
+        if not self.enabled:
+            return _NOOP_SPAN
+        return Span(self, name, attributes)
+
+    @staticmethod
+    def current():
+        """
+        The innermost open span in this context, or None.
+        """
+        return _current_span.get()
+
+    def _finish(self, span):
+        metrics = self.metrics
+        metrics.observe("stage_duration", span.seconds, stage=span.name)
+        if span.llm_calls:
+            metrics.inc("llm_calls", span.llm_calls, stage=span.name)
+            metrics.inc("llm_prompt_tokens", span.prompt_tokens, stage=span.name)
+            metrics.inc("llm_completion_tokens", span.completion_tokens, stage=span.name)
+        if "cache_hit" in span.attributes:
+            metrics.inc("cache_lookups", stage=span.name, hit=str(bool(span.attributes["cache_hit"])).lower())
+        if "route" in span.attributes:
+            metrics.inc("routes", stage=span.name, route=span.attributes["route"])
+        if "error" in span.attributes:
+            metrics.inc("errors", stage=span.name, error=span.attributes["error"])
+
+        if span.parent is None and self.trace_path:
+            record = {"trace_id": span.trace_id, **span.to_dict()}
+            line = json.dumps(record, default=str)
+            with self._file_lock:
+                with open(self.trace_path, "a") as f:
+                    f.write(line + "\n")
+
+
+tracer = Tracer()
+
+
+class TokenUsageHandler(BaseCallbackHandler):
+    """
+    LangChain callback that charges LLM calls and token counts to the open span.
+
+    Token counts come from the model's usage metadata when it reports them
+    and are estimated from the prompt and completion text otherwise.
+    """
+    run_inline = True
+
+    def __init__(self):
+        self._runs = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        span = _current_span.get()
+        if span is None:
+            return
+        prompt_tokens = sum(count_tokens(str(message.content)) for batch in messages for message in batch)
+        with self._lock:
+            self._runs[run_id] = (span, prompt_tokens)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        span, prompt_tokens = run
+        completion_tokens = 0
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or usage
+                completion_tokens += count_tokens(generation.text)
+        if usage:
+            prompt_tokens = usage.get("input_tokens", prompt_tokens)
+            completion_tokens = usage.get("output_tokens", completion_tokens)
+        with self._lock:
+            span.llm_calls += 1
+            span.prompt_tokens += prompt_tokens
+            span.completion_tokens += completion_tokens
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            if run is not None:
+                run[0].llm_calls += 1
+
+
+def start_metrics_server(port, host="127.0.0.1", metrics=None):
+    """
+    Serve metrics for Prometheus at http://host:port/metrics on a daemon thread.
+
+    Args:
+        port (int): Port to listen on.
+        host (str, optional): Interface to bind; local only by default.
+        metrics (Metrics, optional): Metrics to serve; defaults to the global tracer's.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    metrics = metrics or tracer.metrics
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
@@ -1,22 +1,396 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.vectorstores import FAISS
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
+import hashlib
+import json
 import os
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
+
+import faiss
+import numpy as np
+
+from chunker import TokenChunker
+from embeddings import CachedEmbeddings, EmbeddingPipeline
+from flow import arun_flow, run_flow
+from index_cache import IndexCache
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from tracing import percentile, tracer
+
+# Index types trade recall for memory and search time. Recall@5 against
+# flat on 3,000 synthetic chunks (benchmarks/index_types.py): sq_fp16 keeps
+# ~0.99 at half the size. ivf_pq is ~6x smaller but its codes are lossy:
+# probing 8 of its 76 lists found only ~0.49 of the true neighbours. Probing
+# a quarter of the lists (the default) and re-ranking RERANK_FACTOR * k
+# candidates by their exact cached vectors reaches ~0.81; probing half of
+# them (IVF_NPROBE=38) reaches ~0.92 for about 1.5x the search time.
+INDEX_TYPES = ("flat", "sq_fp16", "ivf_pq")
+# IVF-PQ needs enough vectors to train 256 codewords per subquantizer and
+# about 39 per inverted list; smaller stores fall back to float16
+MIN_PQ_TRAINING = 256
+MIN_POINTS_PER_LIST = 39
+MIN_NPROBE = 8
+RERANK_FACTOR = 4
 
 class VectorStoreManager:
-    def __init__(self, model="models/embedding-001"):
+    def __init__(self, model="models/embedding-001", cache_dir=None, embeddings=None,
+                 batch_size=32, max_workers=4, retrieval_mode="hybrid", lexical_threshold=0.6,
+                 query_cache_size=1024, chunk_cache_size=20000, chunk_tokens=300, chunk_overlap_tokens=0,
+                 index_type="flat", ivf_lists=None, ivf_nprobe=None, pq_subquantizers=None, mmap=False):
         """
         Initialize the Vector Store Manager.
         
         Args:
             model (str, optional): Embedding model to use. Defaults to "models/embedding-001".
+            cache_dir (str, optional): Directory for the persistent index cache.
+                Caching is disabled when not provided.
+            embeddings (Embeddings, optional): Embedding backend to use instead of
+                the Google model, e.g. an offline HashingEmbeddings.
+            batch_size (int, optional): Chunks per embedding request.
+            max_workers (int, optional): Concurrent embedding requests.
+            retrieval_mode (str, optional): Default search mode: "vector" (FAISS only),
+                "hybrid" (BM25 and FAISS fused by reciprocal rank) or "lexical_first"
+                (BM25 alone when its best hit scores above lexical_threshold, else hybrid).
+            lexical_threshold (float, optional): Normalised BM25 score needed to skip
+                the embedding call in "lexical_first" mode.
+            query_cache_size (int, optional): Query embeddings kept in the shared LRU cache.
+            chunk_cache_size (int, optional): Chunk embeddings kept, keyed by content
+                hash, so rebuilding an edited document only embeds its changed chunks.
+            chunk_tokens (int, optional): Maximum tokens per chunk.
+            chunk_overlap_tokens (int, optional): Tokens repeated between consecutive chunks.
+            index_type (str, optional): FAISS index built for each store: "flat"
+                (exact float32), "sq_fp16" (float16 scalar quantisation, half the
+                memory) or "ivf_pq" (inverted lists with product-quantised codes,
+                for large corpora; approximate).
+            ivf_lists (int, optional): Inverted lists of an IVF-PQ index; defaults
+                to 4 * sqrt(number of vectors).
+            ivf_nprobe (int, optional): Inverted lists visited per IVF-PQ search;
+                defaults to a quarter of the lists, and at least MIN_NPROBE.
+            pq_subquantizers (int, optional): Bytes per IVF-PQ code; defaults to
+                one per 8 dimensions.
+            mmap (bool, optional): Serve indexes memory-mapped read-only from the
+                index cache, so worker processes share their pages. Needs cache_dir.
         """
-        self.embeddings = GoogleGenerativeAIEmbeddings(model=model)
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=4000,
-            chunk_overlap=1000,
-            separators=["\n\n", "\n", " ", ""]
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type '{index_type}'. Expected one of {INDEX_TYPES}.")
+        if embeddings is None:
+            embeddings = GoogleGenerativeAIEmbeddings(model=model)
+        else:
+            model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.model = model
+        # Every store searches through the same query-embedding cache
+        self.embeddings = CachedEmbeddings(embeddings, max_entries=query_cache_size)
+        self.embedding_pipeline = EmbeddingPipeline(
+            embeddings,
+            batch_size=batch_size,
+            max_workers=max_workers
         )
+        # Token-sized chunks that follow headings, paragraphs and pages
+        self.text_splitter = TokenChunker(
+            chunk_tokens=chunk_tokens,
+            overlap_tokens=chunk_overlap_tokens
+        )
+        self.index_type = index_type
+        self.ivf_lists = ivf_lists
+        self.ivf_nprobe = ivf_nprobe
+        self.pq_subquantizers = pq_subquantizers
+        self.index_cache = IndexCache(cache_dir, mmap=mmap) if cache_dir else None
+        self.retrieval_mode = retrieval_mode
+        self.lexical_threshold = lexical_threshold
+        self.retrieval_counts = Counter()
+        # BM25 index built alongside each FAISS store
+        self.lexical_indexes = weakref.WeakKeyDictionary()
+        # Index cache key of each store, to find the exact vectors of compressed ones
+        self.cache_keys = weakref.WeakKeyDictionary()
+        # Exact vectors used to re-rank the candidates of each IVF-PQ store
+        self.rerank_vectors = weakref.WeakKeyDictionary()
+        self.chunk_cache_size = chunk_cache_size
+        self.chunk_vectors = OrderedDict()
+        # Chunk key -> (weak reference to a memory-mapped store, position in it)
+        self.chunk_locations = OrderedDict()
+        self._chunk_lock = threading.Lock()
+
+    def cache_settings(self):
+        """
+        Settings that determine the contents of a built index.
+        
+        Returns:
+            dict: Chunker and embedding settings used in the cache key.
+        """
+        return {"model": self.model, **self.text_splitter.settings(), **self.index_settings()}
+
+    def index_settings(self):
+        """
+        Settings of the FAISS index type; empty for the default flat index,
+        so existing cache entries stay valid.
+        
+        Returns:
+            dict: Index settings used in cache keys.
+        """
+        if self.index_type == "flat":
+            return {}
+        settings = {"index_type": self.index_type}
+        if self.index_type == "ivf_pq":
+            settings.update(ivf_lists=self.ivf_lists, pq_subquantizers=self.pq_subquantizers)
+        return settings
+
+    def _load_cached(self, key_text, settings):
+        """
+        Look up a previously built index for identical inputs.
+        
+        Returns:
+            tuple: (cache key or None, cached FAISS store or None)
+        """
+        if not self.index_cache:
+            return None, None
+        cache_key = self.index_cache.make_key(key_text, settings)
+        vector_store = self.index_cache.load(cache_key, self.embeddings)
+        if vector_store is not None:
+            self._prepare_index(vector_store.index)
+            self.cache_keys[vector_store] = cache_key
+            self._remember_chunks(vector_store)
+        return cache_key, vector_store
+
+    def _save_cached(self, cache_key, vector_store, settings, vectors=None):
+        """
+        Store a freshly built index in the cache.
+        
+        Args:
+            cache_key (str or None): Key from _load_cached; nothing is saved without one.
+            vector_store (FAISS): The built store.
+            settings (dict): Settings recorded next to the index.
+            vectors (list, optional): Exact embeddings of the store's chunks,
+                kept on disk next to compressed indexes.
+        
+        Returns:
+            FAISS: The store to serve; the memory-mapped copy when mmap is enabled.
+        """
+        if not cache_key:
+            return vector_store
+        if self.index_type == "flat":
+            vectors = None
+        self.index_cache.save(cache_key, vector_store, settings, vectors=vectors)
+        if self.index_cache.mmap:
+            mapped = self.index_cache.load(cache_key, self.embeddings)
+            if mapped is not None:
+                self._prepare_index(mapped.index)
+                self.cache_keys[mapped] = cache_key
+                self._remember_chunks(mapped)
+                return mapped
+        self.cache_keys[vector_store] = cache_key
+        return vector_store
+
+    def _exact_vectors(self, vector_store, documents, approximate=True):
+        """
+        Embeddings of a store's chunks in index order, exact wherever possible.
+        
+        Flat indexes hold exact vectors. Compressed ones only reconstruct
+        approximations, so their vectors come from the copy saved next to
+        the cached index, then from the chunk cache, and only then from the index.
+        
+        Args:
+            vector_store (FAISS): Store to read.
+            documents (list[Document]): Its documents in index order.
+            approximate (bool, optional): Whether reconstructed vectors may be used.
+        
+        Returns:
+            np.ndarray or None: float32 matrix with one row per chunk, or None
+                if approximate is False and some vectors are not known exactly.
+        """
+        count = vector_store.index.ntotal
+        if self.index_type == "flat":
+            return vector_store.index.reconstruct_n(0, count)
+        cache_key = self.cache_keys.get(vector_store)
+        if cache_key:
+            vectors = self.index_cache.load_vectors(cache_key)
+            if vectors is not None and len(vectors) == count:
+                return vectors
+        with self._chunk_lock:
+            cached = [self.chunk_vectors.get(self._chunk_key(doc.page_content)) for doc in documents]
+        if any(vector is None for vector in cached):
+            if not approximate:
+                return None
+            reconstructed = vector_store.index.reconstruct_n(0, count)
+            cached = [vector if vector is not None else reconstructed[i] for i, vector in enumerate(cached)]
+        return np.asarray(cached, dtype=np.float32)
+
+    def _pq_subquantizers(self, dimensions):
+        if self.pq_subquantizers:
+            return self.pq_subquantizers
+        # The number of subquantizers has to divide the dimensionality
+        return next(m for m in range(max(1, dimensions // 8), 0, -1) if dimensions % m == 0)
+
+    def _make_index(self, matrix, metric):
+        """
+        Build and fill a compressed FAISS index of the configured type.
+        
+        Args:
+            matrix (np.ndarray): float32 vectors, one per row.
+            metric (int): FAISS metric of the store.
+        
+        Returns:
+            faiss.Index: The filled index.
+        """
+        count, dimensions = matrix.shape
+        spec = "SQfp16"
+        if self.index_type == "ivf_pq":
+            lists = min(self.ivf_lists or int(4 * count ** 0.5), count // MIN_POINTS_PER_LIST)
+            if count >= MIN_PQ_TRAINING and lists >= 1:
+                # "np" skips polysemous training, which search does not use and
+                # which takes minutes even on a few hundred vectors
+                spec = f"IVF{lists},PQ{self._pq_subquantizers(dimensions)}np"
+        index = faiss.index_factory(dimensions, spec, metric)
+        index.train(matrix)
+        index.add(matrix)
+        self._prepare_index(index)
+        return index
+
+    def _prepare_index(self, index):
+        """
+        Set search parameters and make IVF vectors reconstructible.
+        """
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is None:
+            return
+        ivf.nprobe = min(self.ivf_nprobe or max(MIN_NPROBE, ivf.nlist // 4), ivf.nlist)
+        # Merging stores and the chunk cache read vectors back by position
+        if ivf.direct_map.no():
+            ivf.make_direct_map()
+
+    def _from_embeddings(self, texts, vectors, metadatas):
+        """
+        Create a FAISS store of the configured index type from embedded texts.
+        """
+        vector_store = FAISS.from_embeddings(
+            text_embeddings=list(zip(texts, vectors)),
+            embedding=self.embeddings,
+            metadatas=metadatas
+        )
+        if self.index_type != "flat" and texts:
+            matrix = np.asarray(vectors, dtype=np.float32)
+            if getattr(vector_store, "_normalize_L2", False):
+                faiss.normalize_L2(matrix)
+            vector_store.index = self._make_index(matrix, vector_store.index.metric_type)
+        return vector_store
+
+    @staticmethod
+    def _chunk_key(text):
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _store_chunk_vectors(self, keys, vectors):
+        with self._chunk_lock:
+            for key, vector in zip(keys, vectors):
+                self.chunk_vectors[key] = vector
+                self.chunk_vectors.move_to_end(key)
+            while len(self.chunk_vectors) > self.chunk_cache_size:
+                self.chunk_vectors.popitem(last=False)
+
+    def _remember_chunks(self, vector_store):
+        """
+        Make the chunk embeddings of a loaded store reusable by later builds.
+        
+        Vectors are copied into the chunk cache, except from memory-mapped
+        stores: copying those would undo sharing their pages, so only where
+        each chunk sits is recorded, and embed_chunks reads it back on a miss.
+        """
+        if not vector_store.index.ntotal:
+            return
+        documents = self._store_documents(vector_store)
+        keys = [self._chunk_key(doc.page_content) for doc in documents]
+        if self.index_cache.mmap:
+            store_ref = weakref.ref(vector_store)
+            with self._chunk_lock:
+                for position, key in enumerate(keys):
+                    self.chunk_locations[key] = (store_ref, position)
+                    self.chunk_locations.move_to_end(key)
+                while len(self.chunk_locations) > self.chunk_cache_size:
+                    self.chunk_locations.popitem(last=False)
+            return
+        # Product-quantised reconstructions are too lossy to reuse as embeddings
+        vectors = self._exact_vectors(vector_store, documents, approximate=self.index_type != "ivf_pq")
+        if vectors is not None:
+            self._store_chunk_vectors(keys, np.asarray(vectors).tolist())
+
+    def _located_vectors(self, keys):
+        """
+        Read the embeddings of chunks held by memory-mapped stores.
+        
+        Rows come from the exact vectors cached next to compressed indexes,
+        else from the index itself unless it is product-quantised.
+        
+        Args:
+            keys (list[str]): Chunk keys missing from the chunk cache.
+        
+        Returns:
+            dict: Maps the keys that were found to their embeddings.
+        """
+        with self._chunk_lock:
+            locations = [(key, self.chunk_locations.get(key)) for key in keys]
+        by_store = {}
+        for key, location in locations:
+            vector_store = location[0]() if location else None
+            if vector_store is not None:
+                by_store.setdefault(vector_store, []).append((key, location[1]))
+        found = {}
+        for vector_store, entries in by_store.items():
+            cache_key = self.cache_keys.get(vector_store)
+            stored = None
+            if cache_key and self.index_type != "flat":
+                stored = self.index_cache.load_vectors(cache_key)
+                if stored is not None and len(stored) != vector_store.index.ntotal:
+                    stored = None
+            for key, position in entries:
+                if stored is not None:
+                    found[key] = stored[position].tolist()
+                elif self.index_type != "ivf_pq":
+                    found[key] = vector_store.index.reconstruct(position).tolist()
+        return found
+
+    def embed_chunks(self, text_chunks):
+        """
+        Embed chunks, reusing the cached embedding of any chunk seen before.
+        
+        Args:
+            text_chunks (list[str]): Chunks to embed.
+        
+        Returns:
+            tuple: (one embedding per chunk, number of chunks actually embedded)
+        """
+        keys = [self._chunk_key(text) for text in text_chunks]
+        with self._chunk_lock:
+            vectors = [self.chunk_vectors.get(key) for key in keys]
+        missing = {}
+        for key, text, vector in zip(keys, text_chunks, vectors):
+            if vector is None:
+                missing.setdefault(key, text)
+        found = self._located_vectors(list(missing)) if missing else {}
+        for key in found:
+            del missing[key]
+        if missing:
+            with tracer.span("embed_chunks", chunks=len(text_chunks), embedded=len(missing)):
+                found.update(zip(missing, self.embedding_pipeline.embed(list(missing.values()))))
+        if found:
+            vectors = [vector if vector is not None else found[key] for key, vector in zip(keys, vectors)]
+        self._store_chunk_vectors(keys, vectors)
+        return vectors, len(missing)
+
+    def _build(self, text_chunks, metadatas=None):
+        """
+        Embed new chunks in concurrent batches and create a FAISS store.
+        
+        Returns:
+            tuple: (FAISS store, chunk embeddings)
+        """
+        vectors, embedded = self.embed_chunks(text_chunks)
+        vector_store = self._from_embeddings(text_chunks, vectors, metadatas)
+        if embedded:
+            stats = self.embedding_pipeline.last_stats
+            print(
+                f"Embedded {stats['texts']} of {len(text_chunks)} chunks in {stats['batches']} batches "
+                f"({stats['texts_per_second']:.1f} chunks/s)"
+            )
+        return vector_store, vectors
 
     def create_vector_store(self, text, index_path=None):
         """
@@ -29,22 +403,280 @@ class VectorStoreManager:
         Returns:
             FAISS: Created vector store.
         """
-        # Split text into chunks
-        text_chunks = self.text_splitter.split_text(text)
-        
-        # Create vector store
-        vector_store = FAISS.from_texts(
-            texts=text_chunks,
-            embedding=self.embeddings
-        )
+        settings = self.cache_settings()
+        cache_key, vector_store = self._load_cached(text, settings)
         
+        if vector_store is None:
+            # Split text into chunks, keeping the pages each came from
+            chunks = self.text_splitter.chunk(text)
+            vector_store, vectors = self._build(
+                [chunk["text"] for chunk in chunks],
+                [{"page_start": chunk["page_start"], "page_end": chunk["page_end"]} for chunk in chunks]
+            )
+            vector_store = self._save_cached(cache_key, vector_store, settings, vectors)
+        self._attach_lexical_index(vector_store)
+
         # Save index if path is provided
         if index_path:
             vector_store.save_local(index_path)
         
         return vector_store
 
-    def retrieve_relevant_chunks(self, query, vector_store, top_k=5):
+    def create_vector_store_from_chunks(self, text_chunks, metadatas=None, index_path=None, lexical=True):
+        """
+        Create a FAISS vector store from already split chunks.
+        
+        Args:
+            text_chunks (list[str]): Chunks to be embedded and stored.
+            metadatas (list[dict], optional): Metadata for each chunk.
+            index_path (str, optional): Path to save the FAISS index.
+            lexical (bool, optional): Whether to build the BM25 index too; not
+                needed for stores that are only merged into another one.
+        
+        Returns:
+            FAISS: Created vector store.
+        """
+        settings = {"model": self.model, "prebuilt_chunks": True, **self.index_settings()}
+        key_text = json.dumps({"chunks": text_chunks, "metadatas": metadatas}, sort_keys=True)
+        cache_key, vector_store = self._load_cached(key_text, settings)
+        
+        if vector_store is None:
+            vector_store, vectors = self._build(text_chunks, metadatas)
+            vector_store = self._save_cached(cache_key, vector_store, settings, vectors)
+        if lexical:
+            self._attach_lexical_index(vector_store)
+
+        if index_path:
+            vector_store.save_local(index_path)
+        
+        return vector_store
+
+    def merge_vector_stores(self, vector_stores, exclude=None):
+        """
+        Combine several FAISS stores into a new one without re-embedding.
+        
+        The inputs are left untouched, so they can keep serving searches
+        while the merged store is built. Vectors are taken exact (see
+        _exact_vectors), so compressed indexes are not quantised twice.
+        
+        Args:
+            vector_stores (list[FAISS]): Stores to combine.
+            exclude (callable, optional): Takes an input store and one of its
+                Documents and returns True if the document should be left out.
+        
+        Returns:
+            FAISS or None: Store holding every document, or None if all inputs are empty.
+        """
+        texts, vectors, metadatas = [], [], []
+        for vector_store in vector_stores:
+            if not vector_store.index.ntotal:
+                continue
+            documents = self._store_documents(vector_store)
+            matrix = self._exact_vectors(vector_store, documents)
+            if exclude is not None:
+                kept = [i for i, doc in enumerate(documents) if not exclude(vector_store, doc)]
+                if not kept:
+                    continue
+                documents = [documents[i] for i in kept]
+                matrix = matrix[kept]
+            texts.extend(doc.page_content for doc in documents)
+            metadatas.extend(doc.metadata for doc in documents)
+            vectors.append(matrix)
+        if not texts:
+            return None
+        vectors = np.vstack(vectors).astype(np.float32, copy=False)
+        settings = {"model": self.model, "merged": True, **self.index_settings()}
+        cache_key = merged = None
+        # Flat merges are cheap to redo, but compressed indexes have to be
+        # retrained, so they are cached; memory-mapped stores must be on disk anyway
+        if self.index_cache and (self.index_cache.mmap or self.index_type != "flat"):
+            key_text = json.dumps({"chunks": texts, "metadatas": metadatas}, sort_keys=True, default=str)
+            cache_key, merged = self._load_cached(key_text, settings)
+        if merged is None:
+            merged = self._save_cached(cache_key, self._from_embeddings(texts, vectors, metadatas), settings, vectors)
+        self._attach_lexical_index(merged)
+        return merged
+
+    @staticmethod
+    def _store_documents(vector_store):
+        """
+        Documents of a FAISS store in index order.
+        """
+        return [
+            vector_store.docstore.search(vector_store.index_to_docstore_id[i])
+            for i in range(len(vector_store.index_to_docstore_id))
+        ]
+
+    def _attach_lexical_index(self, vector_store):
+        documents = self._store_documents(vector_store)
+        self.lexical_indexes[vector_store] = {
+            "bm25": BM25Index([doc.page_content for doc in documents]),
+            "documents": documents,
+            "filters": {},
+        }
+
+    def _lexical_search(self, query, vector_store, top_k, mode, filter=None):
+        """
+        Run the BM25 side of a search.
+        
+        Returns:
+            tuple: (lexical index or None, BM25 hits, final documents if the
+                lexical fast path answered the query, else None)
+        """
+        lexical = self.lexical_indexes.get(vector_store)
+        if mode == "vector" or lexical is None:
+            return None, [], None
+        allowed = self._allowed_positions(lexical, filter)
+        hits = lexical["bm25"].search(query, k=top_k * 2, allowed=allowed)
+        if mode == "lexical_first" and hits and hits[0][2] >= self.lexical_threshold:
+            self.retrieval_counts["lexical"] += 1
+            return lexical, hits, [lexical["documents"][position] for position, _, _ in hits[:top_k]]
+        return lexical, hits, None
+
+    @staticmethod
+    def _allowed_positions(lexical, filter):
+        """
+        Positions of the documents whose metadata matches a filter, cached per filter.
+        """
+        if not filter:
+            return None
+        key = tuple(sorted(filter.items()))
+        allowed = lexical["filters"].get(key)
+        if allowed is None:
+            allowed = {
+                position
+                for position, doc in enumerate(lexical["documents"])
+                if all(doc.metadata.get(field) == value for field, value in filter.items())
+            }
+            lexical["filters"][key] = allowed
+        return allowed
+
+    @staticmethod
+    def _vector_fetch_k(vector_store, fetch_k, filter):
+        # FAISS filters after the nearest-neighbour search, so look further
+        # ahead when only part of the index can match
+        if not filter:
+            return fetch_k
+        return min(vector_store.index.ntotal, max(50, fetch_k * 10))
+
+    def _vector_positions(self, query_vector, vector_store, catalog, k, filter):
+        """
+        Nearest chunks to a query embedding, as positions in the index.
+        
+        Positions identify a chunk exactly, even when several sources of the
+        shared index contain the same chunk text.
+        
+        Returns:
+            list[int]: Up to k positions allowed by the filter, nearest first.
+        """
+        if not vector_store.index.ntotal:
+            return []
+        matrix = np.asarray([query_vector], dtype=np.float32)
+        if getattr(vector_store, "_normalize_L2", False):
+            faiss.normalize_L2(matrix)
+        allowed = self._allowed_positions(catalog, filter)
+        exact = self._rerank_matrix(vector_store)
+        fetch_k = k * RERANK_FACTOR if exact is not None else k
+        _, indices = vector_store.index.search(matrix, self._vector_fetch_k(vector_store, fetch_k, filter))
+        positions = [int(i) for i in indices[0] if i != -1 and (allowed is None or i in allowed)]
+        if exact is not None and positions:
+            candidates = np.asarray(exact[positions], dtype=np.float32)
+            if getattr(vector_store, "_normalize_L2", False):
+                faiss.normalize_L2(candidates)
+            if vector_store.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+                order = np.argsort(-(candidates @ matrix[0]), kind="stable")
+            else:
+                order = np.argsort(((candidates - matrix[0]) ** 2).sum(axis=1), kind="stable")
+            positions = [positions[i] for i in order]
+        return positions[:k]
+
+    def _rerank_matrix(self, vector_store):
+        """
+        Exact vectors to re-rank the candidates of an IVF-PQ store with.
+        
+        Returns:
+            np.ndarray or None: Memory-mapped matrix, or None for other index
+                types and for IVF-PQ stores that are not in the index cache.
+        """
+        if self.index_type != "ivf_pq" or faiss.try_extract_index_ivf(vector_store.index) is None:
+            return None
+        exact = self.rerank_vectors.get(vector_store)
+        if exact is None:
+            cache_key = self.cache_keys.get(vector_store)
+            exact = self.index_cache.load_vectors(cache_key) if cache_key else None
+            if exact is None or len(exact) != vector_store.index.ntotal:
+                return None
+            self.rerank_vectors[vector_store] = exact
+        return exact
+
+    def _fuse(self, lexical, hits, catalog, vector_ranking, top_k):
+        if lexical is None:
+            self.retrieval_counts["vector"] += 1
+            return [catalog["documents"][position] for position in vector_ranking[:top_k]]
+        self.retrieval_counts["hybrid"] += 1
+        lexical_ranking = [position for position, _, _ in hits]
+        fused = reciprocal_rank_fusion([lexical_ranking, vector_ranking])
+        return [lexical["documents"][position] for position in fused[:top_k]]
+
+    def _search_flow(self, query, vector_store, top_k, mode, filter):
+        """
+        Search flow shared by search_documents and asearch_documents (see flow.py).
+        """
+        mode = mode or self.retrieval_mode
+        with tracer.span("search", mode=mode) as span:
+            lexical, hits, docs = self._lexical_search(query, vector_store, top_k, mode, filter)
+            if docs is not None:
+                span.set("path", "lexical")
+                return docs
+            k = top_k * 2 if lexical is not None else top_k
+            # Documents and filter cache of the store, kept with its BM25 index
+            catalog = self.lexical_indexes.get(vector_store)
+            if catalog is None:
+                span.set("path", "vector")
+                self.retrieval_counts["vector"] += 1
+                return (yield "similarity_search", (
+                    vector_store, query, k, filter, self._vector_fetch_k(vector_store, k, filter)
+                ))
+            query_vector = yield "embed_query", (query,)
+            vector_ranking = self._vector_positions(query_vector, vector_store, catalog, k, filter)
+            span.set("path", "vector" if lexical is None else "hybrid")
+            return self._fuse(lexical, hits, catalog, vector_ranking, top_k)
+
+    def search_documents(self, query, vector_store, top_k=5, mode=None, filter=None):
+        """
+        Search a vector store with the given retrieval mode.
+        
+        Args:
+            query (str): User's question.
+            vector_store (FAISS): The FAISS vector store.
+            top_k (int, optional): Number of documents to return.
+            mode (str, optional): "vector", "hybrid" or "lexical_first";
+                defaults to the manager's retrieval_mode.
+            filter (dict, optional): Only return documents whose metadata has
+                these values, e.g. {"source": "transcript"}.
+        
+        Returns:
+            list[Document]: Most relevant documents, best first.
+        """
+        return run_flow(self._search_flow(query, vector_store, top_k, mode, filter), {
+            "embed_query": self.embeddings.embed_query,
+            "similarity_search": lambda store, query, k, filter, fetch_k: store.similarity_search(
+                query, k=k, filter=filter, fetch_k=fetch_k
+            ),
+        })
+
+    async def asearch_documents(self, query, vector_store, top_k=5, mode=None, filter=None):
+        """
+        Async variant of search_documents.
+        """
+        return await arun_flow(self._search_flow(query, vector_store, top_k, mode, filter), {
+            "embed_query": self.embeddings.aembed_query,
+            "similarity_search": lambda store, query, k, filter, fetch_k: store.asimilarity_search(
+                query, k=k, filter=filter, fetch_k=fetch_k
+            ),
+        })
+
+    def retrieve_relevant_chunks(self, query, vector_store, top_k=5, filter=None):
         """
         Retrieve top_k relevant chunks from the vector store.
         
@@ -52,15 +684,117 @@ class VectorStoreManager:
             query (str): User's question.
             vector_store (FAISS): The FAISS vector store.
             top_k (int, optional): Number of top similar chunks. Defaults to 5.
+            filter (dict, optional): Metadata values the chunks must match.
         
         Returns:
             str: Retrieved context.
         """
         # Retrieve similar documents
-        similar_docs = vector_store.similarity_search(query, k=top_k)
+        similar_docs = self.search_documents(query, vector_store, top_k=top_k, filter=filter)
         
         # Extract the text content from the retrieved documents
         retrieved_chunks = [doc.page_content for doc in similar_docs]
         context = "\n\n".join(retrieved_chunks)
         
-        return context
\ No newline at end of file
+        return context
+
+    async def aretrieve_relevant_chunks(self, query, vector_store, top_k=5, filter=None):
+        """
+        Async variant of retrieve_relevant_chunks.
+        
+        Args:
+            query (str): User's question.
+            vector_store (FAISS): The FAISS vector store.
+            top_k (int, optional): Number of top similar chunks. Defaults to 5.
+            filter (dict, optional): Metadata values the chunks must match.
+        
+        Returns:
+            str: Retrieved context.
+        """
+        similar_docs = await self.asearch_documents(query, vector_store, top_k=top_k, filter=filter)
+        return "\n\n".join(doc.page_content for doc in similar_docs)
+
+    def batch_search(self, queries, vector_store, top_k=5):
+        """
+        Search many queries at once by vector.
+        
+        All uncached queries are embedded in a single request and the FAISS
+        index is searched with one batched call. Lexical retrieval modes are
+        not applied.
+        
+        Args:
+            queries (list[str]): User questions.
+            vector_store (FAISS): The FAISS vector store.
+            top_k (int, optional): Number of documents per query.
+        
+        Returns:
+            list[list[Document]]: Most similar documents for each query, best first.
+        """
+        if not queries:
+            return []
+        matrix = np.asarray(self.embeddings.embed_queries(queries), dtype=np.float32)
+        if getattr(vector_store, "_normalize_L2", False):
+            faiss.normalize_L2(matrix)
+        _, indices = vector_store.index.search(matrix, top_k)
+        return [
+            [
+                vector_store.docstore.search(vector_store.index_to_docstore_id[i])
+                for i in row
+                if i != -1
+            ]
+            for row in indices
+        ]
+
+    def batch_retrieve_relevant_chunks(self, queries, vector_store, top_k=5):
+        """
+        Batched variant of retrieve_relevant_chunks.
+        
+        Returns:
+            list[str]: Retrieved context for each query.
+        """
+        return [
+            "\n\n".join(doc.page_content for doc in docs)
+            for docs in self.batch_search(queries, vector_store, top_k=top_k)
+        ]
+
+    def query_cache_stats(self):
+        """
+        Statistics of the shared query-embedding cache.
+        
+        Returns:
+            dict: hits, misses, size and hit rate.
+        """
+        return self.embeddings.stats()
+
+    def evaluate_retrieval(self, vector_store, labelled_queries, top_k=5, modes=("vector", "hybrid", "lexical_first")):
+        """
+        Measure recall@k and latency of each retrieval mode.
+        
+        Args:
+            vector_store (FAISS): The FAISS vector store.
+            labelled_queries (list[tuple]): (query, expected text) pairs; a query
+                counts as recalled when a returned chunk contains the expected text.
+            top_k (int, optional): Number of retrieved chunks.
+            modes (tuple, optional): Retrieval modes to compare.
+        
+        Returns:
+            dict: Maps each mode to its recall@k and mean/p95 latency in milliseconds.
+        """
+        results = {}
+        for mode in modes:
+            latencies = []
+            recalled = 0
+            for query, expected in labelled_queries:
+                started = time.perf_counter()
+                docs = self.search_documents(query, vector_store, top_k=top_k, mode=mode)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if any(expected.lower() in doc.page_content.lower() for doc in docs):
+                    recalled += 1
+            latencies.sort()
+            count = len(latencies)
+            results[mode] = {
+                f"recall@{top_k}": recalled / count if count else 0.0,
+                "mean_ms": sum(latencies) / count if count else 0.0,
+                "p95_ms": percentile(latencies, 0.95) if count else 0.0,
+            }
+        return results